@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks
+----------
+
+Benchmarks of Gateway ingestion and dispatch paths. Run all with `python -m mdiscord.benchmarks`.
+
+:copyright: (c) 2024 Mmesek
+"""
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark Suite
+----------
+
+Runs all benchmarks writing one JSON object per line, starting with versions of the environment.
+
+Usage: `python -m mdiscord.benchmarks [--repeat 100] [--guilds 20] [--members 5000] [--channels 500]`
+
+:copyright: (c) 2024 Mmesek
+"""
+
+import argparse
+import asyncio
+import platform
+import sys
+
+import aiohttp
+import msgspec
+
+from mdiscord.benchmarks import events, ingest
+
+
+def main(argv: list[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Runs all benchmarks")
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--guilds", type=int, default=20)
+    parser.add_argument("--members", type=int, default=5000)
+    parser.add_argument("--channels", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    results = [
+        {
+            "benchmark": "environment",
+            "python": platform.python_version(),
+            "msgspec": msgspec.__version__,
+            "aiohttp": aiohttp.__version__,
+        }
+    ]
+    results += asyncio.run(events.run(args.repeat, args.members, args.channels))
+    results += asyncio.run(ingest.run(args.guilds, args.members, args.channels))
+    for result in results:
+        sys.stdout.write(msgspec.json.encode(result).decode() + "\n")
+
+
+if __name__ == "__main__":
+    main()
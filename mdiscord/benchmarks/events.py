@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Event Benchmark
+----------
+
+Measures throughput and allocations of decoding, model construction and dispatching
+of every Gateway event as well as a large GUILD_CREATE.
+
+Usage: `python -m mdiscord.benchmarks.events [--repeat 100] [--members 5000] [--channels 500]`
+
+:copyright: (c) 2024 Mmesek
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+import tracemalloc
+from typing import Awaitable, Callable
+
+import msgspec
+
+from mdiscord.benchmarks.payloads import Payload_Generator
+from mdiscord.types import Gateway_Events, Gateway_Payload
+from mdiscord.utils.serializer import Deserializer
+from mdiscord.websocket.opcodes import Opcodes, onDispatch
+
+STAGES = ("decode", "prepare", "dispatch")
+
+
+async def handler(client: Opcodes, data) -> None:
+    """Handler registered for every event so `dispatch` has something to call"""
+
+
+def register() -> None:
+    for event in Gateway_Events:
+        onDispatch(handler, event=event.name.lower(), optional=True)
+
+
+def frames(payloads: list[dict]) -> list[str]:
+    encoder = msgspec.json.Encoder()
+    return [encoder.encode(payload).decode() for payload in payloads]
+
+
+async def _inputs(stage: str, client: Opcodes, frames: list[str]) -> tuple[Callable[[object], Awaitable], list]:
+    """Returns function running the stage and inputs for it, prepared by previous stages"""
+    decompress = Deserializer()
+    if stage == "decode":
+
+        async def decode(frame: str) -> Gateway_Payload:
+            return decompress(frame)
+
+        return decode, frames
+
+    payloads = [decompress(frame) for frame in frames]
+    if stage == "prepare":
+        return client.prepare_payload, payloads
+
+    for payload in payloads:
+        await client.prepare_payload(payload)
+    return client.dispatch, payloads
+
+
+async def measure(stage: str, corpus: str, frames: list[str], repeat: int = 1) -> dict:
+    """Runs stage over frames `repeat` times, then once more tracing allocations of each payload"""
+    client = Opcodes()
+    elapsed = 0.0
+    for _ in range(repeat):
+        run, inputs = await _inputs(stage, client, frames)
+        start = time.perf_counter()
+        for item in inputs:
+            await run(item)
+        elapsed += time.perf_counter() - start
+
+    run, inputs = await _inputs(stage, client, frames)
+    allocated: list[int] = []
+    tracemalloc.start()
+    for item in inputs:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        await run(item)
+        allocated.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    events = len(frames) * repeat
+    return {
+        "benchmark": "events",
+        "stage": stage,
+        "corpus": corpus,
+        "events": events,
+        "seconds": round(elapsed, 6),
+        "events_per_second": round(events / elapsed, 1) if elapsed else None,
+        "alloc_mean_bytes": round(sum(allocated) / len(allocated)),
+        "alloc_peak_bytes": max(allocated),
+    }
+
+
+async def run(repeat: int = 100, members: int = 5000, channels: int = 500) -> list[dict]:
+    register()
+    generator = Payload_Generator()
+    corpora = {
+        "all_events": frames(list(generator.events())),
+        "guild_create": frames(
+            [Payload_Generator(sizes={"members": members, "channels": channels}).event(Gateway_Events.Guild_Create)]
+        ),
+    }
+    return [
+        await measure(stage, corpus, data, repeat if corpus == "all_events" else max(repeat // 10, 1))
+        for corpus, data in corpora.items()
+        for stage in STAGES
+    ]
+
+
+def main(argv: list[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Decoding, model construction and dispatching of Gateway events")
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--members", type=int, default=5000)
+    parser.add_argument("--channels", type=int, default=500)
+    args = parser.parse_args(argv)
+    for result in asyncio.run(run(args.repeat, args.members, args.channels)):
+        sys.stdout.write(msgspec.json.encode(result).decode() + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Ingest Benchmark
+----------
+
+Measures event loop lag while a startup burst of large GUILD_CREATE frames is inflated and decoded,
+either on the loop or in `Ingest_Thread`.
+
+Usage: `python -m mdiscord.benchmarks.ingest [--guilds 20] [--members 5000] [--channels 500]`
+
+:copyright: (c) 2024 Mmesek
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import zlib
+
+import msgspec
+
+from mdiscord.benchmarks.payloads import Payload_Generator
+from mdiscord.types import Gateway_Events
+from mdiscord.utils.serializer import Deserializer
+from mdiscord.websocket.ingest import Ingest_Thread
+
+TICK = 0.001
+"""Seconds between loop lag samples"""
+
+
+def compress(payloads: list[dict]) -> list[bytes]:
+    """Compresses payloads as a single `zlib-stream`, one frame per payload"""
+    compressor = zlib.compressobj()
+    encoder = msgspec.json.Encoder()
+    return [compressor.compress(encoder.encode(p)) + compressor.flush(zlib.Z_SYNC_FLUSH) for p in payloads]
+
+
+async def measure(frames: list[bytes], threaded: bool) -> dict:
+    """Feeds frames yielding to the loop after each one as if they were read from socket, sampling loop lag"""
+    lags: list[float] = []
+    running = True
+
+    async def ticker():
+        while running:
+            start = time.perf_counter()
+            await asyncio.sleep(TICK)
+            lags.append(time.perf_counter() - start - TICK)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(TICK * 2)
+    start = time.perf_counter()
+
+    decoded = 0
+    if threaded:
+        ingest = Ingest_Thread(asyncio.get_running_loop())
+        ingest.start()
+
+        async def feed():
+            for frame in frames:
+                await ingest.feed(frame)
+                await asyncio.sleep(0)
+            ingest.close()
+
+        feeder = asyncio.create_task(feed())
+        async for _ in ingest:
+            decoded += 1
+        await feeder
+    else:
+        decompress = Deserializer()
+        for frame in frames:
+            decoded += decompress(frame) is not None
+            await asyncio.sleep(0)
+
+    elapsed = time.perf_counter() - start
+    running = False
+    await tick
+
+    lags.sort()
+    return {
+        "benchmark": "ingest",
+        "mode": "thread" if threaded else "loop",
+        "frames": decoded,
+        "bytes": sum(len(frame) for frame in frames),
+        "seconds": round(elapsed, 4),
+        "lag_max_ms": round(lags[-1] * 1000, 3),
+        "lag_p99_ms": round(lags[int(len(lags) * 0.99)] * 1000, 3),
+        "lag_mean_ms": round(statistics.fmean(lags) * 1000, 3),
+    }
+
+
+async def run(guilds: int = 20, members: int = 5000, channels: int = 500) -> list[dict]:
+    generator = Payload_Generator(sizes={"members": members, "channels": channels})
+    frames = compress([generator.event(Gateway_Events.Guild_Create) for _ in range(guilds)])
+    return [await measure(frames, threaded=False), await measure(frames, threaded=True)]
+
+
+def main(argv: list[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Event loop lag while ingesting GUILD_CREATE burst")
+    parser.add_argument("--guilds", type=int, default=20)
+    parser.add_argument("--members", type=int, default=5000)
+    parser.add_argument("--channels", type=int, default=500)
+    args = parser.parse_args(argv)
+    for result in asyncio.run(run(args.guilds, args.members, args.channels)):
+        sys.stdout.write(msgspec.json.encode(result).decode() + "\n")
+
+
+if __name__ == "__main__":
+    main()
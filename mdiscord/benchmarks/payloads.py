@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic Payloads
+----------
+
+Generates Gateway payloads from model definitions.
+
+:copyright: (c) 2024 Mmesek
+"""
+
+import itertools
+from typing import Any, Iterator
+
+import msgspec
+import msgspec.inspect as mi
+
+from mdiscord.types import Gateway_Events
+from mdiscord.types.meta import Duration, Snowflake, UnixTimestamp
+
+TIMESTAMP = "2024-07-01T00:00:00+00:00"
+SNOWFLAKE = 1 << 60
+"""First generated ID"""
+OPCODE_EVENTS = {"Hello", "Reconnect", "Invalid_Session"}
+"""Members of `Gateway_Events` sent as their own opcodes rather than Dispatch"""
+
+
+class Payload_Generator:
+    """Builds JSON-compatible data for models filling every field of nested models up to `depth`
+    and only required ones below it. IDs are unique within generator
+
+    Parameters
+    ----------
+    depth:
+        Levels of nested models which get all their fields
+    list_size:
+        Amount of items in lists of nested models
+    sizes:
+        Amount of items in lists of event's model by field name, for example `{"members": 5000}`
+
+    Example
+    -------
+    >>> generator = Payload_Generator(sizes={"members": 3, "channels": 2})
+    >>> payload = generator.event(Gateway_Events.Guild_Create)
+    >>> payload["t"], len(payload["d"]["members"]), len(payload["d"]["channels"])
+    ('GUILD_CREATE', 3, 2)
+    >>> type(Gateway_Events.Guild_Create(**payload["d"])).__name__
+    'Guild'
+    """
+
+    def __init__(self, depth: int = 1, list_size: int = 1, sizes: dict[str, int] = None):
+        self.depth = depth
+        self.list_size = list_size
+        self.sizes = sizes or {}
+        self._ids = itertools.count(SNOWFLAKE)
+        self._sequence = itertools.count(1)
+        self._infos: dict[type, mi.Type] = {}
+
+    def _info(self, model: type) -> mi.Type:
+        if model not in self._infos:
+            self._infos[model] = mi.type_info(model)
+        return self._infos[model]
+
+    def model(self, model: type) -> Any:
+        """Data of model"""
+        if not issubclass(model, msgspec.Struct):
+            return model()
+        return self._value(self._info(model), 0, self.sizes)
+
+    def event(self, event: Gateway_Events) -> dict:
+        """Dispatch payload of event"""
+        return {"op": 0, "s": next(self._sequence), "t": event.name.upper(), "d": self.model(event.func)}
+
+    def events(self) -> Iterator[dict]:
+        """Dispatch payload of each event"""
+        for event in Gateway_Events:
+            if event.name not in OPCODE_EVENTS:
+                yield self.event(event)
+
+    def _struct(self, info: mi.StructType, depth: int, sizes: dict[str, int]) -> dict:
+        data = {}
+        for field in info.fields:
+            if field.name.startswith("_") or (depth > self.depth and field.required is False):
+                continue
+            size = sizes.get(field.name)
+            data[field.encode_name] = self._value(field.type, depth + 1, size=size)
+        return data
+
+    def _value(self, info: mi.Type, depth: int, sizes: dict[str, int] = None, size: int = None) -> Any:
+        if isinstance(info, mi.StructType):
+            return self._struct(info, depth, sizes or {})
+        elif isinstance(info, (mi.ListType, mi.SetType, mi.FrozenSetType, mi.VarTupleType)):
+            if size is None:
+                size = self.list_size if depth <= self.depth else 0
+            return [self._value(info.item_type, depth) for _ in range(size)]
+        elif isinstance(info, mi.TupleType):
+            return [self._value(item, depth) for item in info.item_types]
+        elif isinstance(info, mi.UnionType):
+            return self._value(next((t for t in info.types if not isinstance(t, mi.NoneType)), mi.NoneType()), depth)
+        elif isinstance(info, mi.EnumType):
+            return next(iter(info.cls)).value
+        elif isinstance(info, mi.LiteralType):
+            return info.values[0]
+        elif isinstance(info, mi.CustomType):
+            if issubclass(info.cls, Snowflake):
+                return str(next(self._ids))
+            elif issubclass(info.cls, UnixTimestamp):
+                return 1719792000000
+            elif issubclass(info.cls, Duration):
+                return 60
+            return None
+        elif isinstance(info, mi.StrType):
+            return "string"
+        elif isinstance(info, mi.BytesType):
+            return ""
+        elif isinstance(info, mi.BoolType):
+            return False
+        elif isinstance(info, mi.IntType):
+            return 1
+        elif isinstance(info, mi.FloatType):
+            return 1.0
+        elif isinstance(info, mi.DateTimeType):
+            return TIMESTAMP
+        elif isinstance(info, mi.DictType):
+            return {}
+        return None
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""
+Replay Benchmark
+----------
+
+Replays Gateway recording of a shard made with `record` option through decoding and dispatching.
+
+Usage: `python -m mdiscord.benchmarks.replay recordings/Bot-0-1.gw [--fast] [--speed 1.0]`
+
+:copyright: (c) 2024 Mmesek
+"""
+
+import argparse
+import asyncio
+import sys
+
+import msgspec
+
+from mdiscord.websocket.replay import Replayer
+
+
+def main(argv: list[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Replays recorded Gateway frames through decoding and dispatching")
+    parser.add_argument("path")
+    parser.add_argument("--fast", action="store_true", help="Replay as fast as possible instead of original pace")
+    parser.add_argument("--speed", type=float, default=1.0, help="Multiplier of original pace")
+    args = parser.parse_args(argv)
+    stats = asyncio.run(Replayer(args.path, speed=None if args.fast else args.speed).replay())
+    sys.stdout.write(msgspec.json.encode({"benchmark": "replay", **stats}).decode() + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -77,6 +77,18 @@ class JsonBadRequest(BadRequest):
     """Error caused by malformated request with JSON response"""
 
 
+class GatewayError(DiscordError):
+    """Error that occured on Gateway connection"""
+
+
+class FatalCloseCode(GatewayError):
+    """Gateway connection was closed with a code that doesn't allow reconnecting"""
+
+    def __init__(self, code: int, reason: str = None) -> None:
+        self.code = code
+        super().__init__(f"Gateway closed connection with code {code}" + (f" ({reason})" if reason else ""))
+
+
 class SoftError(Exception):
     """Non fatal exception to be raised by user code that is not important enough to log"""
 
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+"""
+Testing
+----------
+
+Utilities for testing clients without connecting to Discord.
+
+:copyright: (c) 2024 Mmesek
+"""
+
+from mdiscord.testing.gateway import Fake_Gateway  # noqa: F401
+from mdiscord.testing.soak import soak  # noqa: F401
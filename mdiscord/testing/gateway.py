@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+Fake Gateway
+----------
+
+Local Gateway server for offline integration and soak tests.
+
+:copyright: (c) 2024 Mmesek
+"""
+
+import asyncio
+import secrets
+import time
+import zlib
+from collections import Counter
+from typing import Callable
+
+import aiohttp
+import msgspec
+from aiohttp import web
+
+from mdiscord.types import Gateway_Bot, Gateway_Opcodes, Session_Start_Limit
+from mdiscord.utils.utils import log
+
+TICK = 0.01
+"""Seconds between batches of synthetic traffic"""
+
+
+def message_create(seq: int) -> tuple[str, dict]:
+    """Default synthetic event"""
+    return "MESSAGE_CREATE", {
+        "id": str(10**17 + seq),
+        "guild_id": str(10**16 + seq % 10),
+        "channel_id": str(10**15 + seq % 100),
+        "author": {"id": str(10**14 + seq % 1000), "username": f"user{seq % 1000}", "discriminator": "0"},
+        "content": f"Message {seq}",
+        "timestamp": "2024-07-01T00:00:00+00:00",
+        "tts": False,
+        "mention_everyone": False,
+        "mentions": [],
+        "mention_roles": [],
+        "attachments": [],
+        "embeds": [],
+        "pinned": False,
+        "type": 0,
+    }
+
+
+class _Connection:
+    """Client connected to fake gateway"""
+
+    def __init__(self, ws: web.WebSocketResponse):
+        self.ws = ws
+        self.session_id: str = None
+        self.shard: list[int] = None
+        self._compressor = zlib.compressobj()
+        self._encoder = msgspec.json.Encoder()
+
+    async def send(self, op: int, d=None, t: str = None, s: int = None) -> None:
+        data = self._encoder.encode({"op": op, "d": d, "s": s, "t": t})
+        await self.ws.send_bytes(self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH))
+
+
+class Fake_Gateway:
+    """Gateway speaking HELLO, IDENTIFY, RESUME, heartbeats, RECONNECT, INVALID_SESSION and close codes
+    over `zlib-stream`, optionally emitting synthetic Dispatch traffic
+
+    Parameters
+    ----------
+    rate:
+        Synthetic events per second sent to each ready connection. `0` to not send any
+    heartbeat_interval:
+        Milliseconds sent in HELLO
+    event:
+        Function returning event name and data for sequence number
+    acknowledge:
+        Whether heartbeats are acknowledged. Disable to simulate zombie connection
+    host:
+        Interface to listen on
+    port:
+        Port to listen on. `0` picks a free one
+
+    Example
+    -------
+    >>> async def main():
+    ...     async with Fake_Gateway() as gateway, aiohttp.ClientSession() as session:
+    ...         async with session.ws_connect(gateway.url) as ws:
+    ...             inflate = zlib.decompressobj()
+    ...             hello = msgspec.json.decode(inflate.decompress(await ws.receive_bytes()))
+    ...             await ws.send_json({"op": 2, "d": {"token": "", "shard": [0, 1]}})
+    ...             ready = msgspec.json.decode(inflate.decompress(await ws.receive_bytes()))
+    ...             await gateway.close(4000)
+    ...             await ws.receive()
+    ...         return hello["op"], ready["t"], ws.close_code, gateway.stats["identify"]
+    >>> asyncio.run(main())
+    (10, 'READY', 4000, 1)
+    """
+
+    def __init__(
+        self,
+        rate: float = 0,
+        heartbeat_interval: int = 41250,
+        event: Callable[[int], tuple[str, dict]] = message_create,
+        acknowledge: bool = True,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.rate = rate
+        self.heartbeat_interval = heartbeat_interval
+        self.event = event
+        self.acknowledge = acknowledge
+        self.host = host
+        self.port = port
+        self.url: str = None
+        self.stats: Counter = Counter()
+        """Amount of connections, identifies, resumes, heartbeats and sent Dispatch events"""
+        self.sessions: dict[str, int] = {}
+        """Sequence of each session that can be resumed"""
+        self.connections: set[_Connection] = set()
+        self._runner: web.AppRunner = None
+
+    async def start(self) -> str:
+        """Starts listening, returning URL to connect to"""
+        app = web.Application()
+        app.router.add_get("/", self._handler)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self.port = self._runner.addresses[0][1]
+        self.url = f"ws://{self.host}:{self.port}/"
+        return self.url
+
+    async def stop(self) -> None:
+        await self.close(1001)
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.stop()
+
+    def gateway_bot(self, shards: int = 1, max_concurrency: int = 1) -> Gateway_Bot:
+        """Response of `get_gateway_bot()` pointing at this gateway"""
+        return Gateway_Bot(
+            url=self.url,
+            shards=shards,
+            session_start_limit=Session_Start_Limit(
+                total=1000, remaining=1000, reset_after=0, max_concurrency=max_concurrency
+            ),
+        )
+
+    async def reconnect(self) -> None:
+        """Asks connected clients to reconnect"""
+        await asyncio.gather(*(c.send(Gateway_Opcodes.RECONNECT.value) for c in list(self.connections)))
+
+    async def invalidate(self, resumable: bool = False) -> None:
+        """Invalidates sessions of connected clients"""
+        for connection in list(self.connections):
+            if not resumable:
+                self.sessions.pop(connection.session_id, None)
+            await connection.send(Gateway_Opcodes.INVALID_SESSION.value, resumable)
+
+    async def close(self, code: int = 4000) -> None:
+        """Closes connections with close code"""
+        await asyncio.gather(*(c.ws.close(code=code) for c in list(self.connections)))
+
+    async def _handler(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        connection = _Connection(ws)
+        self.connections.add(connection)
+        self.stats["connections"] += 1
+        traffic: asyncio.Task = None
+
+        try:
+            await connection.send(Gateway_Opcodes.HELLO.value, {"heartbeat_interval": self.heartbeat_interval})
+            async for msg in ws:
+                if msg.type is not aiohttp.WSMsgType.TEXT:
+                    continue
+                payload = msgspec.json.decode(msg.data)
+                op, d = payload.get("op"), payload.get("d")
+
+                if op == Gateway_Opcodes.HEARTBEAT.value:
+                    self.stats["heartbeat"] += 1
+                    if self.acknowledge:
+                        await connection.send(Gateway_Opcodes.HEARTBEAT_ACK.value)
+                elif op == Gateway_Opcodes.IDENTIFY.value:
+                    self.stats["identify"] += 1
+                    connection.session_id = secrets.token_hex(16)
+                    connection.shard = d.get("shard") or [0, 1]
+                    self.sessions[connection.session_id] = 0
+                    await self._dispatch(connection, "READY", self._ready(connection))
+                    traffic = traffic or asyncio.create_task(self._traffic(connection))
+                elif op == Gateway_Opcodes.RESUME.value:
+                    if d.get("session_id") not in self.sessions:
+                        await connection.send(Gateway_Opcodes.INVALID_SESSION.value, False)
+                        continue
+                    self.stats["resume"] += 1
+                    connection.session_id = d["session_id"]
+                    await self._dispatch(connection, "RESUMED", {})
+                    traffic = traffic or asyncio.create_task(self._traffic(connection))
+        except ConnectionResetError:
+            pass
+        finally:
+            if traffic:
+                traffic.cancel()
+            self.connections.discard(connection)
+        return ws
+
+    def _ready(self, connection: _Connection) -> dict:
+        return {
+            "v": 10,
+            "user": {"id": "1", "username": "Fake", "discriminator": "0", "bot": True},
+            "guilds": [],
+            "session_id": connection.session_id,
+            "resume_gateway_url": self.url,
+            "shard": connection.shard,
+            "application": {"id": "1", "flags": 0},
+        }
+
+    async def _dispatch(self, connection: _Connection, t: str, d: dict) -> None:
+        self.sessions[connection.session_id] += 1
+        await connection.send(Gateway_Opcodes.DISPATCH.value, d, t, self.sessions[connection.session_id])
+        self.stats["sent"] += 1
+
+    async def _traffic(self, connection: _Connection) -> None:
+        """Sends synthetic events at `rate` per second"""
+        owed = 0.0
+        last = time.perf_counter()
+        while self.rate and not connection.ws.closed:
+            await asyncio.sleep(TICK)
+            now = time.perf_counter()
+            owed += (now - last) * self.rate
+            last = now
+            while owed >= 1:
+                owed -= 1
+                try:
+                    await self._dispatch(connection, *self.event(self.sessions[connection.session_id] + 1))
+                except ConnectionResetError:
+                    log.debug("Fake Gateway connection reset while sending traffic")
+                    return
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Soak Test
+----------
+
+Runs a client against `Fake_Gateway` measuring throughput and reconnects.
+
+:copyright: (c) 2024 Mmesek
+"""
+
+import asyncio
+import time
+
+from mdiscord.testing.gateway import Fake_Gateway
+from mdiscord.utils.utils import log
+from mdiscord.websocket.websocket import WebSocket_Client
+
+
+async def soak(
+    client: WebSocket_Client, gateway: Fake_Gateway, seconds: float = 60, reconnect_every: float = None
+) -> dict[str, int | float]:
+    """Keeps client connected to started gateway for `seconds`, asking it to reconnect every `reconnect_every` seconds.
+    Returns amount of dispatched events, events per second, reconnects and gateway's stats
+    """
+    client.gateway.set(gateway.gateway_bot(total_shards := client.shards[1]))
+    dispatched = sum(client.counters.values())
+    running = asyncio.create_task(client.start(), name=f"Soak {client.shards[0]}/{total_shards}")
+
+    start = time.perf_counter()
+    while (remaining := seconds - (time.perf_counter() - start)) > 0 and not running.done():
+        await asyncio.sleep(min(reconnect_every or remaining, remaining))
+        if reconnect_every and remaining > reconnect_every:
+            await gateway.reconnect()
+    elapsed = time.perf_counter() - start
+
+    await client.shutdown()
+    try:
+        await asyncio.wait_for(running, 5)
+    except asyncio.TimeoutError:
+        log.warning("Client didn't stop within 5s after soak")
+
+    dispatched = sum(client.counters.values()) - dispatched
+    return {
+        "seconds": round(elapsed, 2),
+        "events": dispatched,
+        "events_per_second": round(dispatched / elapsed, 2),
+        "reconnects": len(client.reconnect_policy.durations),
+        "reconnect_max": round(max(client.reconnect_policy.durations, default=0), 3),
+        **gateway.stats,
+    }
@@ -1010,6 +1010,38 @@ class Gateway_Events(Events):
     Message_Poll_Vote_Remove: Intents.GUILD_MESSAGE_POLLS = Message_Poll_Vote_Remove_Fields
     """User removed a vote on a poll"""
 
+    @property
+    def priority(self) -> "Event_Priority":
+        """Priority class of event used when queue overflows or sheds load
+
+        Example
+        -------
+        >>> Gateway_Events.Typing_Start.priority, Gateway_Events.Message_Create.priority
+        (<Event_Priority.LOW: 3>, <Event_Priority.NORMAL: 2>)
+        """
+        return EVENT_PRIORITIES.get(self.name.upper(), Event_Priority.NORMAL)
+
+
+class Event_Priority(Enum):
+    CRITICAL = 0
+    """Never dropped"""
+    HIGH = 1
+    NORMAL = 2
+    LOW = 3
+    """First to be dropped"""
+
+
+EVENT_PRIORITIES: dict[str, Event_Priority] = {
+    "READY": Event_Priority.CRITICAL,
+    "RESUMED": Event_Priority.CRITICAL,
+    "GUILD_CREATE": Event_Priority.HIGH,
+    "GUILD_DELETE": Event_Priority.HIGH,
+    "INTERACTION_CREATE": Event_Priority.HIGH,
+    "TYPING_START": Event_Priority.LOW,
+    "PRESENCE_UPDATE": Event_Priority.LOW,
+}
+"""Priorities of Gateway events by their name. Events not listed are `Event_Priority.NORMAL`"""
+
 
 def override_base_types():
     from mdiscord.types import models
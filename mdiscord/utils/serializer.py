@@ -9,8 +9,9 @@ Serializer & Deserializer
 """
 
 import zlib
+from collections import Counter
 from datetime import UTC
-from typing import Any
+from typing import Any, Callable
 
 import aiohttp
 import msgspec
@@ -63,14 +64,73 @@ def from_builtins(typ: type, x: Any):
 
 ENCODER = msgspec.json.Encoder(enc_hook=to_builtins)
 
+PEEKED_EVENTS = {"MESSAGE_CREATE", "MESSAGE_UPDATE"}
+"""Events which author is peeked at before decoding"""
+
+
+class _Envelope(msgspec.Struct):
+    op: int
+    d: msgspec.Raw = msgspec.Raw(b"null")
+    s: int | None = None
+    t: str | None = None
+
+
+class _Author(msgspec.Struct):
+    bot: bool = False
+
+
+class _Message(msgspec.Struct):
+    author: _Author | None = None
+    webhook_id: Any = None
+    guild_id: Any = None
+
+
+def bot_event(event: str, guild_id: Any) -> str:
+    """Name under which message from a bot is dispatched after `Opcodes.prepare_payload`
+
+    Example
+    -------
+    >>> bot_event("MESSAGE_CREATE", 1), bot_event("MESSAGE_CREATE", None)
+    ('BOT_MESSAGE_CREATE', 'BOT_DIRECT_MESSAGE_CREATE')
+    """
+    return "BOT_" + event if guild_id else "BOT_DIRECT_" + event
+
 
 class Deserializer:
-    def __init__(self):
+    """Inflates zlib-stream and decodes Gateway payloads
+
+    Parameters
+    ----------
+    skip:
+        Called with `bot_event` name of messages sent by bots or webhooks. When it returns `True`
+        message's data isn't decoded and payload is returned with `d` left `UNSET`.
+        Author is peeked at by decoding only the envelope and message's author, webhook and guild
+
+    Example
+    -------
+    >>> decompress = Deserializer(skip=lambda event: event == "BOT_MESSAGE_CREATE")
+    >>> payload = decompress(
+    ...     '{"op":0,"s":5,"t":"MESSAGE_CREATE","d":{"guild_id":"1","author":{"id":"2","bot":true},"content":"x"}}'
+    ... )
+    >>> payload.s, payload.t, payload.d, decompress.skipped
+    (5, 'MESSAGE_CREATE', UNSET, Counter({'MESSAGE_CREATE': 1}))
+    >>> decompress('{"op":0,"s":6,"t":"MESSAGE_CREATE","d":{"author":{"id":"2","bot":true},"content":"x"}}').d[
+    ...     "content"
+    ... ]
+    'x'
+    """
+
+    def __init__(self, skip: Callable[[str], bool] = None):
         self._buffer = bytearray()
         self._zlib = zlib.decompressobj()
         from mdiscord.types import Gateway_Payload
 
         self._decoder = msgspec.json.Decoder(Gateway_Payload, dec_hook=from_builtins)
+        self.skip = skip
+        self.skipped: Counter = Counter()
+        """Amount of skipped payloads per event"""
+        self._envelope = msgspec.json.Decoder(_Envelope)
+        self._message = msgspec.json.Decoder(_Message)
 
     def __call__(self, msg: bytes):
         if type(msg) is bytes:
@@ -84,8 +144,26 @@ class Deserializer:
             else:
                 return
 
+        if self.skip is not None and ('"bot":true' in msg or '"webhook_id"' in msg):
+            if (payload := self._peek(msg)) is not None:
+                return payload
         return self._decoder.decode(msg)
 
+    def _peek(self, msg: str):
+        """Returns payload without data if it's a message from bot that should be skipped"""
+        envelope = self._envelope.decode(msg)
+        if envelope.t not in PEEKED_EVENTS:
+            return None
+        message = self._message.decode(envelope.d)
+        if not (message.author and message.author.bot or message.webhook_id):
+            return None
+        if not self.skip(bot_event(envelope.t, message.guild_id)):
+            return None
+        self.skipped[envelope.t] += 1
+        from mdiscord.types import Gateway_Opcodes, Gateway_Payload
+
+        return Gateway_Payload(op=Gateway_Opcodes(envelope.op), s=envelope.s, t=envelope.t)
+
 
 def as_dict(object):
     from datetime import datetime
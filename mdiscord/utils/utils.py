@@ -10,12 +10,15 @@ Utility functions for internal usage
 
 import asyncio
 import logging
-from typing import Callable, Optional, Tuple, Union
+import weakref
+from collections import deque
+from typing import Any, Callable, Optional, Tuple, Union
 
 from mlib import logger
 
 from mdiscord.exceptions import Insufficient_Permissions
 from mdiscord.types import Bitwise_Permission_Flags, DiscordObject, Gateway_Events, Intents
+from mdiscord.types.meta import Enum
 
 log = logging.getLogger("mdiscord")
 log.setLevel(logger.log_level)
@@ -53,19 +56,183 @@ def count(*intents):
     return value
 
 
+class Listener:
+    """Pending `wait_for` registration"""
+
+    consumes = True
+    """Whether event resolving this listener is not dispatched further"""
+
+    def __init__(
+        self,
+        future: asyncio.Future,
+        check: Optional[Callable[[DiscordObject], bool]] = None,
+        key: Optional[Tuple[str, Any]] = None,
+    ):
+        self.future = future
+        self.check = check
+        self.key = key
+        self.expiry: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def done(self) -> bool:
+        return self.future.done()
+
+    def matches(self, data: DiscordObject) -> bool:
+        return self.check is None or self.check(data)
+
+    def deliver(self, data: DiscordObject) -> None:
+        self.future.set_result(data)
+
+    def fail(self, exception: Exception) -> None:
+        self.future.set_exception(exception)
+
+
+class Stream_Overflow(Enum):
+    DROP_OLDEST = "drop_oldest"
+    """Oldest queued event is dropped to make room for new one"""
+    DROP_NEW = "drop_new"
+    """New event is dropped"""
+
+
+class Event_Stream:
+    """Bounded queue of Dispatch events consumed with `async for`. Created with `EventListener.events`
+
+    Parameters
+    ----------
+    maxsize:
+        Maximum amount of events waiting to be consumed
+    overflow:
+        Which event to drop when queue is full
+    """
+
+    def __init__(self, maxsize: int = 100, overflow: Stream_Overflow | str = Stream_Overflow.DROP_OLDEST):
+        self.maxsize = maxsize
+        self.overflow = Stream_Overflow(overflow)
+        self.dropped: int = 0
+        """Amount of events dropped due to full queue"""
+        self.closed: bool = False
+        self._items: deque[DiscordObject] = deque()
+        self._waiter: Optional[asyncio.Future] = None
+        self._exception: Optional[Exception] = None
+        self._unregister: Optional[Callable[[], None]] = None
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def put(self, data: DiscordObject) -> None:
+        if self.closed:
+            return
+        if len(self._items) >= self.maxsize:
+            self.dropped += 1
+            if self.overflow is Stream_Overflow.DROP_NEW:
+                return
+            self._items.popleft()
+        self._items.append(data)
+        self._wakeup()
+
+    def fail(self, exception: Exception) -> None:
+        """Closes stream raising `exception` to consumer once queued events are consumed"""
+        self._exception = exception
+        self.close()
+
+    def close(self) -> None:
+        """Stops receiving events. Already queued events can still be consumed"""
+        if self.closed:
+            return
+        self.closed = True
+        if self._unregister:
+            self._unregister()
+        self._wakeup()
+
+    def _wakeup(self) -> None:
+        if self._waiter and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def __aiter__(self) -> "Event_Stream":
+        return self
+
+    async def __anext__(self) -> DiscordObject:
+        while not self._items:
+            if self._exception:
+                exception, self._exception = self._exception, None
+                raise exception
+            if self.closed:
+                raise StopAsyncIteration
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        return self._items.popleft()
+
+    async def __aenter__(self) -> "Event_Stream":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.close()
+
+
+class Stream_Listener(Listener):
+    """`Event_Stream` registration. References stream weakly so it's unregistered once consumer drops it"""
+
+    consumes = False
+
+    def __init__(
+        self,
+        stream: Event_Stream,
+        check: Optional[Callable[[DiscordObject], bool]] = None,
+        key: Optional[Tuple[str, Any]] = None,
+    ):
+        super().__init__(None, check, key)
+        self.stream = weakref.ref(stream)
+
+    @property
+    def done(self) -> bool:
+        stream = self.stream()
+        return stream is None or stream.closed
+
+    def deliver(self, data: DiscordObject) -> None:
+        if (stream := self.stream()) is not None:
+            stream.put(data)
+
+    def fail(self, exception: Exception) -> None:
+        if (stream := self.stream()) is not None:
+            stream.fail(exception)
+
+
+def get_field(data: DiscordObject | dict, path: str | list[str]) -> Any:
+    """Value of field at dotted path, or it's already split parts, of either an object or a dict
+
+    Example
+    -------
+    >>> get_field({"message": {"id": 1}}, "message.id")
+    1
+    >>> get_field({"message": None}, ["message", "id"])
+    """
+    for attr in path.split(".") if isinstance(path, str) else path:
+        if data is None:
+            break
+        data = data.get(attr) if isinstance(data, dict) else getattr(data, attr, None)
+    return data
+
+
 class EventListener:
     """Event Listener mixin"""
 
-    _listeners: dict[str, list[Tuple[asyncio.Future, Callable[[DiscordObject], bool]]]]
+    _listeners: dict[str, dict[Listener, None]]
+    """Listeners without key, in order of registration"""
+    _keyed_listeners: dict[str, dict[str, dict[Any, dict[Listener, None]]]]
+    """Listeners indexed by event, field and it's expected value"""
 
     def wait_for(
         self,
         event: Union[str, Gateway_Events],
         repeat: int = 1,
         *,
-        check: Optional[Callable[[DiscordObject], bool]],
+        check: Optional[Callable[[DiscordObject], bool]] = None,
         timeout: Optional[float] = None,
-    ) -> DiscordObject:
+        key: Optional[Tuple[str, Any]] = None,
+    ) -> asyncio.Future:
         """Wait for Dispatch event that meets predicate statement
 
         Parameters
@@ -73,30 +240,147 @@ class EventListener:
         event:
             Dispatch Event to wait for
         repeat:
-            How many times this event should be waited for
+            Unused, kept for compatibility. Future can be resolved only once
         check:
             Callable function with predicate to meet
         timeout:
-            Timeout after which it should stop waiting for event matching criteria and throw `TimeoutError`
+            Timeout after which it should stop waiting for event matching criteria and throw `TimeoutError`.
+            Listener is removed as soon as it expires
+        key:
+            Pair of field (for example `message_id`, `channel_id`, `user_id`, `data.custom_id`) and it's value
+            the event has to have. Keyed listeners are looked up by value rather than checked one by one
 
         Returns
         -------
         Any:
-            Received Event object that matches criteria"""
+            Received Event object that matches criteria
+
+        Example
+        -------
+        >>> async def main():
+        ...     listener = EventListener()
+        ...     future = listener.wait_for("message_reaction_add", key=("message_id", 1), timeout=0.01)
+        ...     listener.check_listeners("MESSAGE_REACTION_ADD", {"message_id": 2})
+        ...     try:
+        ...         await future
+        ...     except asyncio.TimeoutError:
+        ...         return listener._keyed_listeners
+        >>> asyncio.run(main())
+        {}
+        """
+        loop = asyncio.get_event_loop()
+        listener = Listener(loop.create_future(), check, key)
+        event = self._add_listener(event, listener)
+
+        if timeout is not None:
+            listener.expiry = loop.call_later(timeout, self._expire_listener, listener)
+        listener.future.add_done_callback(lambda _: self._remove_listener(event, listener))
+        return listener.future
+
+    def events(
+        self,
+        event: Union[str, Gateway_Events],
+        *,
+        check: Optional[Callable[[DiscordObject], bool]] = None,
+        key: Optional[Tuple[str, Any]] = None,
+        maxsize: int = 100,
+        overflow: Stream_Overflow | str = Stream_Overflow.DROP_OLDEST,
+    ) -> Event_Stream:
+        """Stream of Dispatch events that meet predicate statement. Unlike `wait_for`, matching events
+        are still dispatched to handlers and stream keeps receiving them until it's closed or no longer referenced
+
+        Parameters
+        ----------
+        event:
+            Dispatch Event to stream
+        check:
+            Callable function with predicate to meet
+        key:
+            Pair of field and it's value the event has to have, same as in `wait_for`
+        maxsize:
+            Maximum amount of events waiting to be consumed
+        overflow:
+            Which event to drop when consumer falls behind
+
+        Returns
+        -------
+        Event_Stream:
+            Asynchronous iterator over received events. Closed when used as a context manager exits
+
+        Example
+        -------
+        >>> async def main():
+        ...     listener = EventListener()
+        ...     received = []
+        ...     async with listener.events("message_create", key=("channel_id", 1), maxsize=2) as stream:
+        ...         for id in range(4):
+        ...             listener.check_listeners("MESSAGE_CREATE", {"channel_id": 1, "id": id})
+        ...         listener.check_listeners("MESSAGE_CREATE", {"channel_id": 2, "id": 4})
+        ...         async for message in stream:
+        ...             received.append(message["id"])
+        ...             if len(stream) == 0:
+        ...                 break
+        ...     return received, stream.dropped, listener._keyed_listeners
+        >>> asyncio.run(main())
+        ([2, 3], 2, {})
+
+        Stream no longer referenced by consumer is unregistered:
+        >>> async def main():
+        ...     listener = EventListener()
+        ...     stream = listener.events("typing_start")
+        ...     del stream
+        ...     return listener._listeners
+        >>> asyncio.run(main())
+        {}
+        """
+        stream = Event_Stream(maxsize, overflow)
+        listener = Stream_Listener(stream, check, key)
+        event = self._add_listener(event, listener)
+        stream._unregister = weakref.finalize(stream, self._remove_listener, event, listener)
+        return stream
+
+    def _add_listener(self, event: Union[str, Gateway_Events], listener: Listener) -> str:
+        """Adds listener to listener table returning name of event it was registered for"""
         if not hasattr(self, "_listeners"):
             self._listeners = {}
+            self._keyed_listeners = {}
         if type(event) is Gateway_Events:
             event = event.name
         elif not (hasattr(Gateway_Events, event.title()) or "direct_message" in event.lower()):
             raise Exception("Event unrecognized")
         event = event.upper()
-        if event not in self._listeners:
-            self._listeners[event] = []
 
-        future = asyncio.get_event_loop().create_future()
-        for i in range(repeat):
-            self._listeners[event].append((future, check))
-        return asyncio.wait_for(future, timeout)
+        if listener.key:
+            field, value = listener.key
+            self._keyed_listeners.setdefault(event, {}).setdefault(field, {}).setdefault(value, {})[listener] = None
+        else:
+            self._listeners.setdefault(event, {})[listener] = None
+        return event
+
+    def _expire_listener(self, listener: Listener) -> None:
+        if not listener.future.done():
+            listener.future.set_exception(asyncio.TimeoutError())
+
+    def _remove_listener(self, event: str, listener: Listener) -> None:
+        if listener.expiry:
+            listener.expiry.cancel()
+        if listener.key:
+            field, value = listener.key
+            fields = self._keyed_listeners.get(event, {})
+            values = fields.get(field, {})
+            listeners = values.get(value, {})
+            listeners.pop(listener, None)
+            if not listeners:
+                values.pop(value, None)
+                if not values:
+                    fields.pop(field, None)
+                    if not fields:
+                        self._keyed_listeners.pop(event, None)
+        else:
+            listeners = self._listeners.get(event, {})
+            listeners.pop(listener, None)
+            if not listeners:
+                self._listeners.pop(event, None)
 
     def check_listeners(self, event: str, data: DiscordObject) -> bool:
         """Method checking received data against predicates of current listeners
@@ -107,36 +391,33 @@ class EventListener:
             Dispatch Event of which listeners should be checked
         data:
             Received Event Payload to check predicates against as well as set result to"""
-        if not hasattr(self, "_listeners") or not self._listeners.get(event, None):
+        if not hasattr(self, "_listeners"):
             return
-        removed = []
+        candidates = list(self._listeners.get(event, ()))
+        for field, values in self._keyed_listeners.get(event, {}).items():
+            try:
+                candidates.extend(values.get(get_field(data, field), ()))
+            except TypeError:
+                continue
+        if not candidates:
+            return
+
+        resolved = False
         predicates_met = []
-        for i, (future, check) in enumerate(self._listeners[event]):
-            if future.cancelled():
-                removed.append(i)
+        for listener in candidates:
+            if listener.done:
                 continue
-            if check in predicates_met:
+            if listener.consumes and listener.check is not None and listener.check in predicates_met:
                 continue
 
             try:
-                if check(data):
-                    future.set_result(data)
-                    predicates_met.append(check)
-                    removed.append(i)
+                if listener.matches(data):
+                    listener.deliver(data)
+                    if listener.consumes:
+                        predicates_met.append(listener.check)
+                        resolved = True
             except Exception as ex:
-                try:
-                    future.set_exception(ex)
-                except asyncio.InvalidStateError:
-                    log.exception(
-                        "InvalidStateError was raised by future waiting for event %s with data %s", event, data
-                    )
-                    removed.append(i)
-
-        # Inspired by Discord.py, Thanks.
-        if len(removed) == len(self._listeners[event]):
-            self._listeners.pop(event)
-        else:
-            for id in reversed(removed):
-                del self._listeners[event][id]
-        if len(removed):
+                listener.fail(ex)
+
+        if resolved:
             return True
@@ -10,3 +10,5 @@ Websocket client for Discord API
 
 from mdiscord.websocket.websocket import WebSocket_Client as Client  # noqa: F401
 from mdiscord.websocket.opcodes import onDispatch  # noqa: F401
+from mdiscord.websocket.predicates import Field  # noqa: F401
+from mdiscord.websocket.sharding import Shard_Manager  # noqa: F401
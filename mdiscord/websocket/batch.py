@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Batched Delivery
+----------
+
+Collects events for handlers which process them in bulk.
+
+:copyright: (c) 2024 Mmesek
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from mdiscord.utils.utils import log
+
+
+class Batch_Collector:
+    """Collects items delivering them together once `size` of them are collected or `window` passes since first one
+
+    Parameters
+    ----------
+    callback:
+        Coroutine function called with list of collected items
+    size:
+        Amount of items after which batch is delivered
+    window:
+        Seconds after first item after which batch is delivered even if it's not full
+
+    Example
+    -------
+    >>> async def main():
+    ...     batches = []
+    ...
+    ...     async def callback(items):
+    ...         batches.append(items)
+    ...
+    ...     collector = Batch_Collector(callback, size=2, window=0.01)
+    ...     for item in range(3):
+    ...         collector.add(item)
+    ...     await asyncio.sleep(0.05)
+    ...     collector.add(3)
+    ...     await collector.drain()
+    ...     return batches
+    >>> asyncio.run(main())
+    [[0, 1], [2], [3]]
+    """
+
+    def __init__(self, callback: Callable[[list], Awaitable], size: int, window: float):
+        self.callback = callback
+        self.size = size
+        self.window = window
+        self.items: list = []
+        self._timer: asyncio.TimerHandle = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def add(self, item: Any) -> None:
+        self.items.append(item)
+        if len(self.items) >= self.size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self.flush)
+
+    def flush(self) -> asyncio.Task | None:
+        """Delivers collected items right away"""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if not self.items:
+            return None
+        items, self.items = self.items, []
+        task = asyncio.ensure_future(self._deliver(items))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def drain(self) -> None:
+        """Delivers collected items and waits until every delivery finishes"""
+        self.flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
+
+    async def _deliver(self, items: list) -> None:
+        try:
+            await self.callback(items)
+        except Exception as ex:
+            log.exception("Batch Error", exc_info=ex)
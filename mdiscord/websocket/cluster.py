@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+Shard Clusters
+----------
+
+Spreads shards of a bot over multiple worker processes.
+
+:copyright: (c) 2024 Mmesek
+"""
+
+import asyncio
+import multiprocessing
+import queue
+import sys
+import time
+from multiprocessing.context import BaseContext
+
+from mdiscord.exceptions import FatalCloseCode
+from mdiscord.http.client import HTTP_Client
+from mdiscord.types import Session_Start_Limit
+from mdiscord.utils.utils import log
+from mdiscord.websocket.ratelimit import IDENTIFY_WINDOW, Identify_Limiter
+from mdiscord.websocket.sharding import Shard_Manager
+from mdiscord.websocket.websocket import WebSocket_Client
+
+FATAL_EXIT_CODE = 78
+"""Exit code of worker which shard was closed with a fatal close code. Such cluster isn't restarted"""
+
+
+class Shared_Identify_Limiter(Identify_Limiter):
+    """`Identify_Limiter` which state is shared between processes
+
+    Example
+    -------
+    >>> limiter = Shared_Identify_Limiter(max_concurrency=2, remaining=1, reset_after=60000, total=5)
+    >>> limiter._reserve(0), limiter.remaining
+    (0, 0)
+    >>> limiter._reserve(1) > 0
+    True
+    """
+
+    clock = staticmethod(time.time)
+
+    def __init__(
+        self,
+        max_concurrency: int = 1,
+        remaining: int = None,
+        reset_after: int = 0,
+        total: int = None,
+        context: BaseContext = None,
+    ):
+        context = context or multiprocessing.get_context("spawn")
+        max_concurrency = max(max_concurrency or 1, 1)
+        self._lock = context.Lock()
+        self._counts = context.Array("q", [-1, -1], lock=False)
+        self._reset_at = context.Value("d", 0, lock=False)
+        super().__init__(max_concurrency, remaining, reset_after, total)
+        self._identified = context.Array("d", [-IDENTIFY_WINDOW] * max_concurrency, lock=False)
+
+    def _get(self, index: int) -> int | None:
+        return None if self._counts[index] < 0 else self._counts[index]
+
+    def _set(self, index: int, value: int | None) -> None:
+        self._counts[index] = -1 if value is None else max(value, 0)
+
+    remaining = property(lambda self: self._get(0), lambda self, value: self._set(0, value))
+    total = property(lambda self: self._get(1), lambda self, value: self._set(1, value))
+    reset_at = property(lambda self: self._reset_at.value, lambda self, value: setattr(self._reset_at, "value", value))
+
+    def _reserve(self, bucket: int) -> float:
+        with self._lock:
+            return super()._reserve(bucket)
+
+
+def _run_cluster(
+    cluster_id: int,
+    client: type[WebSocket_Client],
+    name: str,
+    cfg: dict,
+    total_shards: int,
+    shard_ids: list[int],
+    limiter: Shared_Identify_Limiter,
+    metrics: multiprocessing.Queue,
+    interval: float,
+) -> None:
+    """Entrypoint of a worker process"""
+
+    async def report(manager: Shard_Manager):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                metrics.put_nowait((cluster_id, time.time(), manager.metrics()))
+            except queue.Full:
+                pass
+
+    async def main():
+        manager = Shard_Manager(client, name, cfg, total_shards=total_shards, shard_ids=shard_ids, limiter=limiter)
+        reporter = asyncio.create_task(report(manager), name="Cluster Metrics")
+        try:
+            await manager.start()
+        finally:
+            reporter.cancel()
+            await manager.shutdown()
+
+    log.info("Starting cluster %s with shards %s", cluster_id, shard_ids)
+    try:
+        asyncio.run(main())
+    except FatalCloseCode as ex:
+        log.critical("Cluster %s stopped due to fatal close code: %s", cluster_id, ex)
+        sys.exit(FATAL_EXIT_CODE)
+
+
+class Cluster_Launcher:
+    """Runs shards of a bot over a pool of worker processes each with it's own event loop.
+    Supervises workers restarting crashed ones, except those stopped by a fatal close code, and collects their metrics.
+    IDENTIFY is coordinated between processes with `Shared_Identify_Limiter`
+
+    Parameters
+    ----------
+    client:
+        Client class to instantiate for each shard. Has to be importable by worker processes
+    name:
+        Name of bot in config
+    cfg:
+        Config passed to each shard
+    total_shards:
+        Amount of shards. Defaults to `shards` config value or recommended amount from `get_gateway_bot()`
+    processes:
+        Amount of worker processes. Defaults to amount of CPU cores
+    metrics_interval:
+        Seconds between workers reporting metrics
+    """
+
+    metrics: dict[int, tuple[float, list[dict]]]
+    """Last reported time and metrics of each cluster"""
+
+    def __init__(
+        self,
+        client: type[WebSocket_Client],
+        name: str,
+        cfg: dict,
+        total_shards: int = None,
+        processes: int = None,
+        metrics_interval: float = 30,
+    ):
+        self.client = client
+        self.name = name
+        self.cfg = cfg
+        self.total_shards = total_shards or cfg[name].get("shards", None)
+        self.processes = processes or cfg[name].get("processes", None) or multiprocessing.cpu_count()
+        self.metrics_interval = metrics_interval
+        self.metrics = {}
+        self.restarts: dict[int, int] = {}
+        self.failed: set[int] = set()
+        """Clusters stopped by a fatal close code, which aren't restarted"""
+        self._context = multiprocessing.get_context("spawn")
+        self._workers: dict[int, multiprocessing.Process] = {}
+        self._started: dict[int, float] = {}
+        self._pending: dict[int, float] = {}
+
+    async def _gateway_bot(self) -> tuple[int, Session_Start_Limit]:
+        http = HTTP_Client(
+            token=self.cfg["DiscordTokens"][self.name],
+            api_version=self.cfg.get("Discord", {}).get("api_version", None),
+        )
+        try:
+            gate = await http.get_gateway_bot()
+        finally:
+            await http.close()
+        return gate.shards or 1, gate.session_start_limit
+
+    def setup(self) -> None:
+        shards, limit = asyncio.run(self._gateway_bot())
+        self.total_shards = self.total_shards or shards
+        self.processes = min(self.processes, self.total_shards)
+        self.limiter = Shared_Identify_Limiter.from_limit(limit, context=self._context)
+        self.clusters = {i: list(range(i, self.total_shards, self.processes)) for i in range(self.processes)}
+        self._metrics = self._context.Queue(maxsize=self.processes * 10)
+
+    def spawn(self, cluster_id: int) -> None:
+        process = self._context.Process(
+            target=_run_cluster,
+            args=(
+                cluster_id,
+                self.client,
+                self.name,
+                self.cfg,
+                self.total_shards,
+                self.clusters[cluster_id],
+                self.limiter,
+                self._metrics,
+                self.metrics_interval,
+            ),
+            name=f"Cluster {cluster_id}",
+            daemon=True,
+        )
+        process.start()
+        self._workers[cluster_id] = process
+        self._started[cluster_id] = time.monotonic()
+
+    def supervise(self) -> None:
+        """Restarts workers that exited. Workers crashing shortly after start are restarted with backoff"""
+        for cluster_id, process in self._workers.items():
+            if process.is_alive() or cluster_id in self._pending or cluster_id in self.failed:
+                continue
+            if process.exitcode == FATAL_EXIT_CODE:
+                log.critical("Cluster %s exited due to fatal close code, it won't be restarted", cluster_id)
+                self.failed.add(cluster_id)
+                continue
+            self.restarts[cluster_id] = self.restarts.get(cluster_id, 0) + 1
+            uptime = time.monotonic() - self._started[cluster_id]
+            delay = min(2 ** self.restarts[cluster_id], 60) if uptime < 60 else 0
+            log.error(
+                "Cluster %s exited with code %s after %ss, restarting in %ss",
+                cluster_id,
+                process.exitcode,
+                round(uptime),
+                delay,
+            )
+            self._pending[cluster_id] = time.monotonic() + delay
+
+        for cluster_id, restart_at in list(self._pending.items()):
+            if restart_at <= time.monotonic():
+                self._pending.pop(cluster_id)
+                self.spawn(cluster_id)
+
+    def collect(self) -> None:
+        while True:
+            try:
+                cluster_id, reported, metrics = self._metrics.get_nowait()
+            except queue.Empty:
+                break
+            self.metrics[cluster_id] = (reported, metrics)
+
+    def run(self) -> None:
+        self.setup()
+        for cluster_id in self.clusters:
+            self.spawn(cluster_id)
+        try:
+            while True:
+                time.sleep(1)
+                self.collect()
+                self.supervise()
+                if len(self.failed) == len(self.clusters):
+                    log.critical("Every cluster exited due to fatal close code")
+                    break
+        except KeyboardInterrupt:
+            log.info("Stopping clusters")
+        finally:
+            for process in self._workers.values():
+                process.terminate()
+            for process in self._workers.values():
+                process.join(5)
@@ -0,0 +1,429 @@
+# -*- coding: utf-8 -*-
+"""
+Dispatch Executor
+----------
+
+Bounded worker pool for Gateway Dispatch events.
+
+:copyright: (c) 2024 Mmesek
+"""
+
+import asyncio
+import time
+from collections import Counter, defaultdict, deque
+from typing import Any, Awaitable, Callable, Coroutine
+
+from mdiscord.types import EVENT_PRIORITIES, Event_Priority, Gateway_Payload
+from mdiscord.types.meta import Enum
+from mdiscord.utils.utils import log
+from mdiscord.websocket.metrics import Event_Metrics
+
+
+class Overflow(Enum):
+    BLOCK = "block"
+    """Reader waits until there is room in the queue"""
+    DROP = "drop"
+    """Lowest priority payload (queued or incoming) is dropped"""
+    SPILL = "spill"
+    """Payload is moved to a spill lane drained before new payloads. Reader waits once it's full as well"""
+
+
+def guild_key(data: Gateway_Payload) -> Any:
+    """Key used to keep events of the same guild in order. Falls back to channel for events outside of guilds
+
+    Example
+    -------
+    >>> guild_key(Gateway_Payload(t="MESSAGE_CREATE", d={"guild_id": 1, "channel_id": 2}))
+    1
+    >>> guild_key(Gateway_Payload(t="GUILD_CREATE", d={"id": 3}))
+    3
+    >>> guild_key(Gateway_Payload(t="MESSAGE_CREATE", d={"channel_id": 2}))
+    2
+    """
+    d = data.d
+    get = d.get if isinstance(d, dict) else lambda k: getattr(d, k, None)
+    key = get("guild_id")
+    if key is None and data.t.startswith("GUILD_"):
+        key = get("id")
+    return key if key is not None else get("channel_id")
+
+
+class _Lane:
+    """Bounded FIFO queue consumed by worker(s). Entries are also indexed by priority, so lowest priority one
+    can be evicted without scanning the queue. Evicted entries are left in queue emptied until it's compacted
+
+    Example
+    -------
+    >>> lane = _Lane()
+    >>> for t, priority in [("MESSAGE_CREATE", 2), ("TYPING_START", 3), ("READY", 0)]:
+    ...     lane.push(Gateway_Payload(t=t), 0.0, priority)
+    >>> lane.lowest(), lane.evict(3).t, len(lane)
+    (3, 'TYPING_START', 2)
+    >>> [data.t for data, _ in lane.items()]
+    ['MESSAGE_CREATE', 'READY']
+    """
+
+    def __init__(self):
+        self.queue: deque[list] = deque()
+        """Entries of payload, time it was queued at and it's priority. Payload is `None` once evicted"""
+        self.priorities: dict[int, deque[list]] = defaultdict(deque)
+        self.size: int = 0
+        """Amount of queued payloads, excluding evicted ones"""
+        self.spill: deque[tuple[Gateway_Payload, float]] = deque()
+        self.getters: deque[asyncio.Future] = deque()
+        self.putters: deque[asyncio.Future] = deque()
+
+    def __len__(self) -> int:
+        return self.size + len(self.spill)
+
+    def push(self, data: Gateway_Payload, enqueued: float, priority: int) -> None:
+        entry = [data, enqueued, priority]
+        self.queue.append(entry)
+        self.priorities[priority].append(entry)
+        self.size += 1
+
+    def pop(self) -> tuple[Gateway_Payload, float]:
+        while True:
+            data, enqueued, priority = self.queue.popleft()
+            if data is not None:
+                self.priorities[priority].popleft()
+                self.size -= 1
+                return data, enqueued
+
+    def lowest(self) -> int | None:
+        """Lowest priority of queued payloads"""
+        return max((priority for priority, entries in self.priorities.items() if entries), default=None)
+
+    def evict(self, priority: int) -> Gateway_Payload:
+        """Removes oldest payload of priority"""
+        entry = self.priorities[priority].popleft()
+        data, entry[0] = entry[0], None
+        self.size -= 1
+        if len(self.queue) > 2 * self.size + 16:
+            self.queue = deque(entry for entry in self.queue if entry[0] is not None)
+        return data
+
+    def items(self) -> list[tuple[Gateway_Payload, float]]:
+        return [(data, enqueued) for data, enqueued, _ in self.queue if data is not None] + list(self.spill)
+
+
+class Dispatch_Executor:
+    """Runs Dispatch payloads on a fixed amount of workers fed from a bounded queue
+
+    Parameters
+    ----------
+    handler:
+        Coroutine function called with each payload
+    workers:
+        Amount of worker tasks. `0` spawns a task per payload instead (previous behaviour)
+    queue_size:
+        Maximum amount of payloads waiting for a worker
+    overflow:
+        What to do with a payload when the queue is full
+    spill_size:
+        Maximum amount of payloads in spill lane. Once it's full, reader waits same as with `block`
+    ordered:
+        Whether each worker should have it's own queue, with payloads assigned by hash of their guild.
+        Events within a guild are then handled one after another in order they were received
+        while different guilds are handled in parallel. Queue size is split between workers
+    event_metrics:
+        Metrics recording how long payloads waited before being handled
+    shed_watermark:
+        Backlog (queued payloads or, without workers, running tasks) above which events
+        of `shed_priority` or lower are shed before being queued. `None` to never shed
+    shed_priority:
+        Highest priority of events that can be shed
+    shed_sample:
+        Every n-th shed event of each type is queued anyway. `0` drops all of them
+
+    Example
+    -------
+    >>> async def handler(data): ...
+    >>> async def main():
+    ...     executor = Dispatch_Executor(handler, workers=1, queue_size=2, overflow=Overflow.DROP)
+    ...     for t in ["TYPING_START", "MESSAGE_CREATE", "READY", "TYPING_START"]:
+    ...         await executor.submit(Gateway_Payload(t=t))
+    ...     return executor.metrics()
+    >>> asyncio.run(main())
+    {'depth': 2, 'high_watermark': 2, 'in_flight': 0, 'spilled': 0, 'dropped': {'TYPING_START': 2}, 'shed': {}}
+
+    Events of the same guild are handled in order:
+    >>> async def main():
+    ...     handled = []
+    ...
+    ...     async def handler(data):
+    ...         await asyncio.sleep(0.01 if data.t == "MESSAGE_CREATE" else 0)
+    ...         handled.append(data.t)
+    ...
+    ...     executor = Dispatch_Executor(handler, workers=4, ordered=True)
+    ...     for t in ["MESSAGE_CREATE", "MESSAGE_UPDATE", "MESSAGE_DELETE"]:
+    ...         await executor.submit(Gateway_Payload(t=t, d={"guild_id": 1}))
+    ...     await asyncio.sleep(0.05)
+    ...     return handled
+    >>> asyncio.run(main())
+    ['MESSAGE_CREATE', 'MESSAGE_UPDATE', 'MESSAGE_DELETE']
+
+    Spill lane is bounded too, so reader waits once both are full:
+    >>> async def main():
+    ...     handled = []
+    ...
+    ...     async def handler(data):
+    ...         handled.append(data.s)
+    ...
+    ...     executor = Dispatch_Executor(handler, workers=1, queue_size=1, overflow="spill", spill_size=1)
+    ...     for s in range(4):
+    ...         await executor.submit(Gateway_Payload(t="MESSAGE_CREATE", s=s))
+    ...         depth = max(depth, executor.depth) if s else executor.depth
+    ...     await executor.drain()
+    ...     return handled, depth, executor.spilled
+    >>> asyncio.run(main())
+    ([0, 1, 2, 3], 2, 2)
+
+    Low priority events are sampled once backlog is above watermark:
+    >>> async def main():
+    ...     executor = Dispatch_Executor(handler, workers=1, shed_watermark=1, shed_sample=2)
+    ...     for t in ["MESSAGE_CREATE", "MESSAGE_CREATE"] + ["TYPING_START"] * 4 + ["INTERACTION_CREATE"]:
+    ...         await executor.submit(Gateway_Payload(t=t))
+    ...     return [data.t for data, _ in executor._lanes[0].items()], executor.metrics()["shed"]
+    >>> asyncio.run(main())
+    (['MESSAGE_CREATE', 'MESSAGE_CREATE', 'TYPING_START', 'TYPING_START', 'INTERACTION_CREATE'], {'TYPING_START': 2})
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Gateway_Payload], Awaitable],
+        workers: int = 0,
+        queue_size: int = 10000,
+        overflow: Overflow | str = Overflow.BLOCK,
+        spill_size: int = 100000,
+        ordered: bool = False,
+        event_metrics: Event_Metrics = None,
+        shed_watermark: int | None = None,
+        shed_priority: Event_Priority | int = Event_Priority.LOW,
+        shed_sample: int = 0,
+    ):
+        self.handler = handler
+        self.event_metrics = event_metrics
+        self.workers = workers
+        self.overflow = Overflow(overflow)
+        self.spill_size = spill_size
+        self.ordered = ordered and workers > 0
+        self.shed_watermark = shed_watermark
+        self.shed_priority = Event_Priority(shed_priority)
+        self.shed_sample = shed_sample
+
+        self.dropped: Counter = Counter()
+        """Amount of dropped payloads per event"""
+        self.shed: Counter = Counter()
+        """Amount of payloads shed per event while backlog was above watermark"""
+        self._shed_seen: Counter = Counter()
+        self.spilled: int = 0
+        """Amount of payloads that went through spill lane"""
+        self.high_watermark: int = 0
+        """Highest observed queue depth"""
+        self.blocked_at: float = 0.0
+        """`time.perf_counter` at which `submit` last stopped waiting for room in queue"""
+        self._blocked: int = 0
+        self._handling: dict[int, Gateway_Payload] = {}
+
+        self._lanes = [_Lane() for _ in range(workers if self.ordered else 1)]
+        self.queue_size = max(queue_size // len(self._lanes), 1)
+        self._workers: list[asyncio.Task] = []
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def depth(self) -> int:
+        """Amount of payloads waiting for a worker"""
+        return sum(len(lane) for lane in self._lanes)
+
+    @property
+    def backlog(self) -> int:
+        """Amount of payloads waiting for a worker or, without workers, being handled"""
+        return self.depth if self.workers else len(self._tasks)
+
+    def priority(self, data: Gateway_Payload) -> Event_Priority:
+        return EVENT_PRIORITIES.get(data.t, Event_Priority.NORMAL)
+
+    def metrics(self) -> dict[str, int | dict[str, int]]:
+        return {
+            "depth": self.depth,
+            "high_watermark": self.high_watermark,
+            "in_flight": len(self._tasks),
+            "spilled": self.spilled,
+            "dropped": dict(self.dropped),
+            "shed": dict(self.shed),
+        }
+
+    def spawn(self, coro: Coroutine, name: str = "Dispatch") -> asyncio.Task:
+        """Creates a task keeping reference to it until it's done"""
+        task = asyncio.create_task(coro, name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def start(self) -> None:
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._worker(self._lanes[i % len(self._lanes)]), name=f"Dispatch Worker {i}")
+                for i in range(self.workers)
+            ]
+
+    def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+
+    def blocked_since(self, moment: float) -> bool:
+        """Whether `submit` waited for room in queue, holding back reader, at any point since `moment`
+
+        Example
+        -------
+        >>> async def handler(data):
+        ...     await asyncio.sleep(0.01)
+        >>> async def main():
+        ...     executor = Dispatch_Executor(handler, workers=1, queue_size=1)
+        ...     started = time.perf_counter()
+        ...     for t in ["MESSAGE_CREATE", "MESSAGE_UPDATE", "MESSAGE_DELETE"]:
+        ...         await executor.submit(Gateway_Payload(t=t))
+        ...     return executor.blocked_since(started), executor.blocked_since(time.perf_counter())
+        >>> asyncio.run(main())
+        (True, False)
+        """
+        return self._blocked > 0 or self.blocked_at >= moment
+
+    def first_unhandled(self) -> int | None:
+        """Lowest sequence of payloads that are queued or being handled"""
+        pending = [data for lane in self._lanes for data, _ in lane.items()]
+        pending += self._handling.values()
+        return min((data.s for data in pending if data.s is not None), default=None)
+
+    async def drain(self, timeout: float | None = None) -> bool:
+        """Waits until queued and running payloads are handled. Returns whether it finished before `timeout`
+
+        Example
+        -------
+        >>> async def main():
+        ...     handled = []
+        ...
+        ...     async def handler(data):
+        ...         await asyncio.sleep(0.01)
+        ...         handled.append(data.t)
+        ...
+        ...     executor = Dispatch_Executor(handler, workers=1)
+        ...     for t in ["MESSAGE_CREATE", "MESSAGE_UPDATE"]:
+        ...         await executor.submit(Gateway_Payload(t=t))
+        ...     return await executor.drain(), handled
+        >>> asyncio.run(main())
+        (True, ['MESSAGE_CREATE', 'MESSAGE_UPDATE'])
+        """
+        try:
+            await asyncio.wait_for(self._drained(), timeout)
+        except asyncio.TimeoutError:
+            log.warning("Dispatch queue wasn't drained within %ss, %s payloads are left", timeout, self.depth)
+            return False
+        return True
+
+    async def _drained(self) -> None:
+        while self.depth or self._handling or any(lane.putters for lane in self._lanes):
+            await asyncio.sleep(0.01)
+
+    def lane(self, data: Gateway_Payload) -> _Lane:
+        if not self.ordered:
+            return self._lanes[0]
+        return self._lanes[hash(guild_key(data)) % len(self._lanes)]
+
+    async def submit(self, data: Gateway_Payload) -> None:
+        """Queues payload for dispatching according to shedding and overflow policy"""
+        if self.shed_watermark is not None and self.backlog > self.shed_watermark and self._should_shed(data):
+            return
+        if not self.workers:
+            self.spawn(self._run(data, time.perf_counter()))
+            return
+        self.start()
+
+        lane = self.lane(data)
+        if lane.spill or lane.size >= self.queue_size:
+            if self.overflow is Overflow.SPILL and len(lane.spill) < self.spill_size:
+                self.spilled += 1
+                lane.spill.append((data, time.perf_counter()))
+                self._track_depth()
+                return
+            elif self.overflow is Overflow.DROP:
+                if not self._evict(lane, data):
+                    return
+            else:
+                self._blocked += 1
+                try:
+                    while lane.spill or lane.size >= self.queue_size:
+                        await self._wait(lane.putters)
+                finally:
+                    self._blocked -= 1
+                    self.blocked_at = time.perf_counter()
+
+        lane.push(data, time.perf_counter(), self.priority(data).value)
+        self._track_depth()
+        self._wakeup(lane.getters)
+
+    def _should_shed(self, data: Gateway_Payload) -> bool:
+        if self.priority(data).value < self.shed_priority.value:
+            return False
+        self._shed_seen[data.t] += 1
+        if self.shed_sample and self._shed_seen[data.t] % self.shed_sample == 0:
+            return False
+        self.shed[data.t] += 1
+        return True
+
+    def _evict(self, lane: _Lane, data: Gateway_Payload) -> bool:
+        """Drops lowest priority payload to make room for `data`. Returns whether `data` should be queued"""
+        priority = self.priority(data).value
+        if (lowest := lane.lowest()) is not None and lowest > priority:
+            self.dropped[lane.evict(lowest).t] += 1
+            return True
+        if priority == Event_Priority.CRITICAL.value:
+            return True
+        self.dropped[data.t] += 1
+        return False
+
+    def _track_depth(self) -> None:
+        depth = self.depth
+        if depth > self.high_watermark:
+            self.high_watermark = depth
+            if self.high_watermark % 1000 == 0:
+                log.warning("Dispatch queue reached depth of %s", self.high_watermark)
+
+    async def _wait(self, waiters: deque[asyncio.Future]) -> None:
+        waiter = asyncio.get_running_loop().create_future()
+        waiters.append(waiter)
+        await waiter
+
+    def _wakeup(self, waiters: deque[asyncio.Future]) -> None:
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+
+    async def _worker(self, lane: _Lane) -> None:
+        while True:
+            while not lane.size:
+                await self._wait(lane.getters)
+            data, enqueued = lane.pop()
+            if lane.spill:
+                spilled, spilled_at = lane.spill.popleft()
+                lane.push(spilled, spilled_at, self.priority(spilled).value)
+            else:
+                self._wakeup(lane.putters)
+
+            try:
+                await self._run(data, enqueued)
+            except Exception as ex:
+                log.exception("Dispatch Worker Error", exc_info=ex)
+
+    async def _run(self, data: Gateway_Payload, enqueued: float) -> None:
+        if self.event_metrics:
+            self.event_metrics.waited(data.t, time.perf_counter() - enqueued)
+        self._handling[id(data)] = data
+        try:
+            await self.handler(data)
+        finally:
+            del self._handling[id(data)]
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Gateway Cache
+----------
+
+Caches Gateway URL and session start information between connections.
+
+:copyright: (c) 2024 Mmesek
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from mdiscord.types import Gateway_Bot
+from mdiscord.utils.utils import log
+
+
+class Gateway_Cache:
+    """Cached response of `get_gateway_bot()`. Once older than `ttl`, cached value is still returned
+    while it's refreshed in background
+
+    Parameters
+    ----------
+    fetch:
+        Coroutine function retrieving fresh value
+    ttl:
+        Seconds after which value should be refreshed. `None` to never refresh
+
+    Example
+    -------
+    >>> calls = []
+    >>> async def fetch():
+    ...     calls.append(1)
+    ...     return Gateway_Bot(url=f"wss://gateway/{len(calls)}")
+    >>> async def main():
+    ...     cache = Gateway_Cache(fetch, ttl=0)
+    ...     first = await cache.get()
+    ...     stale = await cache.get()
+    ...     await asyncio.sleep(0)
+    ...     return first.url, stale.url, (await cache.get()).url
+    >>> asyncio.run(main())
+    ('wss://gateway/1', 'wss://gateway/1', 'wss://gateway/2')
+
+    Without any value retrieved yet, failing fetch raises connection error so connecting is retried
+
+    >>> async def fail():
+    ...     return {"message": "503: Service Unavailable"}
+    >>> asyncio.run(Gateway_Cache(fail).get())
+    Traceback (most recent call last):
+    ...
+    ConnectionError: Gateway URL couldn't be retrieved
+    """
+
+    def __init__(self, fetch: Callable[[], Awaitable[Gateway_Bot]], ttl: float | None = 300):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.value: Gateway_Bot = None
+        self.fetched_at: float = 0
+        self._refreshing: asyncio.Task = None
+
+    @property
+    def stale(self) -> bool:
+        return self.ttl is not None and time.monotonic() - self.fetched_at >= self.ttl
+
+    def set(self, value: Gateway_Bot) -> None:
+        self.value = value
+        self.fetched_at = time.monotonic()
+
+    async def refresh(self) -> Gateway_Bot:
+        if not self._refreshing or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._refresh(), name="Gateway Refresh")
+        return await asyncio.shield(self._refreshing)
+
+    async def _refresh(self) -> Gateway_Bot:
+        value = await self.fetch()
+        if getattr(value, "url", None):
+            self.set(value)
+        return self.value
+
+    def _refreshed(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception():
+            log.warning("Refreshing Gateway failed, using cached value", exc_info=task.exception())
+
+    async def get(self) -> Gateway_Bot:
+        """Returns cached value, fetching it first if there is none"""
+        if self.value is None:
+            if await self.refresh() is None:
+                raise ConnectionError("Gateway URL couldn't be retrieved")
+            return self.value
+        if self.stale and (not self._refreshing or self._refreshing.done()):
+            self._refreshing = asyncio.create_task(self._refresh(), name="Gateway Refresh")
+            self._refreshing.add_done_callback(self._refreshed)
+        return self.value
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Frame Ingestion
+----------
+
+Inflates and decodes Gateway frames outside of event loop.
+
+:copyright: (c) 2024 Mmesek
+"""
+
+import asyncio
+import queue
+import threading
+import time
+
+from mdiscord.types import Gateway_Payload
+from mdiscord.utils.serializer import Deserializer
+from mdiscord.websocket.metrics import Event_Metrics
+
+
+class Ingest_Thread(threading.Thread):
+    """Thread inflating and decoding frames read by event loop, handing finished payloads back in order.
+    Frames are still read from socket by the loop, as `aiohttp` connections are bound to it
+
+    Parameters
+    ----------
+    loop:
+        Event loop to which payloads are handed
+    decompress:
+        Deserializer of the connection. Used only by this thread once started
+    metrics:
+        Metrics to which size and decode time of each frame is reported on the loop
+    maxsize:
+        Maximum amount of frames waiting to be decoded and payloads waiting to be consumed.
+        `feed` waits once reached so reader is held back the same way as by a full dispatch queue
+
+    Example
+    -------
+    >>> import json
+    >>> async def main():
+    ...     ingest = Ingest_Thread(asyncio.get_running_loop())
+    ...     ingest.start()
+    ...     await ingest.feed(json.dumps({"op": 11}))
+    ...     ingest.close()
+    ...     return [payload async for payload in ingest]
+    >>> asyncio.run(main())
+    [Gateway_Payload(op=<Gateway_Opcodes.HEARTBEAT_ACK: 11>, d=UNSET, s=UNSET, t=UNSET, _Client=UNSET)]
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        decompress: Deserializer = None,
+        metrics: Event_Metrics = None,
+        maxsize: int = 1000,
+    ):
+        super().__init__(name="Gateway Ingest", daemon=True)
+        self.loop = loop
+        self.decompress = decompress or Deserializer()
+        self.metrics = metrics
+        self.frames: queue.SimpleQueue[bytes | str | None] = queue.SimpleQueue()
+        self.payloads: asyncio.Queue[Gateway_Payload | Exception | None] = asyncio.Queue()
+        self._slots = asyncio.Semaphore(maxsize)
+        """Held by each frame from being fed until it's payload is consumed or it turns out to be partial"""
+
+    async def feed(self, frame: bytes | str) -> None:
+        """Queues raw frame for decoding, waiting while `maxsize` frames and payloads are pending"""
+        await self._slots.acquire()
+        self.frames.put(frame)
+
+    def close(self) -> None:
+        """Stops thread once queued frames are decoded"""
+        self.frames.put(None)
+
+    def run(self) -> None:
+        while (frame := self.frames.get()) is not None:
+            started = time.perf_counter()
+            try:
+                payload = self.decompress(frame)
+            except Exception as ex:
+                payload = ex
+            if self.metrics and not isinstance(payload, Exception):
+                self.loop.call_soon_threadsafe(
+                    self.metrics.received, len(frame), time.perf_counter() - started, payload
+                )
+            if payload is not None:
+                self.loop.call_soon_threadsafe(self.payloads.put_nowait, payload)
+            else:
+                self.loop.call_soon_threadsafe(self._slots.release)
+        self.loop.call_soon_threadsafe(self.payloads.put_nowait, None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Gateway_Payload | Exception:
+        if (payload := await self.payloads.get()) is None:
+            raise StopAsyncIteration
+        self._slots.release()
+        return payload
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Intents
+----------
+
+Intents required by events and report of configured ones no handler needs.
+
+:copyright: (c) 2024 Mmesek
+"""
+
+from mdiscord.types import Gateway_Events, Intents
+from mdiscord.websocket.metrics import Event_Metrics
+
+
+def event_intent(event: str) -> int:
+    """Intent required to receive event. `0` when event is received regardless of intents.
+    Events prefixed with `DIRECT_` require their Direct Message counterpart
+
+    Example
+    -------
+    >>> Intents(event_intent("MESSAGE_CREATE")), Intents(event_intent("BOT_DIRECT_MESSAGE_CREATE"))
+    (<Intents.GUILD_MESSAGES: 512>, <Intents.DIRECT_MESSAGES: 4096>)
+    >>> Intents(event_intent("DIRECT_MESSAGE_REACTION_ADD"))
+    <Intents.DIRECT_MESSAGE_REACTIONS: 8192>
+    >>> event_intent("READY"), event_intent("UNKNOWN")
+    (0, 0)
+    """
+    event = event.upper()
+    member = getattr(Gateway_Events, event.replace("DIRECT_", "").replace("BOT_", "").title(), None)
+    if member is None:
+        return 0
+    intent = member.annotation(0)
+    if intent and "DIRECT_" in event:
+        intent = getattr(Intents, Intents(intent).name.replace("GUILD_", "DIRECT_", 1), intent)
+    return int(intent)
+
+
+def intents_report(configured: int, required: int, metrics: Event_Metrics = None) -> dict:
+    """Intents that are configured but not required by any handler along with estimate of bandwidth they take,
+    based on size of received payloads of events requiring them
+
+    Parameters
+    ----------
+    configured:
+        Intents client identifies with
+    required:
+        Intents required by registered handlers
+    metrics:
+        Metrics of received payloads. Bandwidth isn't estimated without them
+
+    Example
+    -------
+    >>> metrics = Event_Metrics()
+    >>> for event, size in [("MESSAGE_CREATE", 300), ("TYPING_START", 100), ("PRESENCE_UPDATE", 600)]:
+    ...     metrics.bytes[event].observe(size)
+    >>> intents_report(Intents.GUILD_MESSAGES | Intents.GUILD_PRESENCES | Intents.GUILD_MESSAGE_TYPING, 512, metrics)
+    {'configured': 2816, 'required': 512, 'unused': ['GUILD_PRESENCES', 'GUILD_MESSAGE_TYPING'], 'received_bytes': 1000, 'unused_bytes': 700}
+    """
+    unused = configured & ~required
+    report = {
+        "configured": int(configured),
+        "required": int(required),
+        "unused": [intent.name for intent in Intents if intent & unused],
+    }
+    if metrics:
+        report["received_bytes"] = sum(histogram.sum for histogram in metrics.bytes.values())
+        report["unused_bytes"] = sum(
+            histogram.sum for event, histogram in metrics.bytes.items() if event_intent(event) & unused
+        )
+    return report
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Handler Limits
+----------
+
+Timeouts and concurrency limits of Dispatch handlers.
+
+:copyright: (c) 2024 Mmesek
+"""
+
+import asyncio
+from collections import Counter
+from typing import TYPE_CHECKING, Any, Callable
+
+from mdiscord.types import Gateway_Payload
+from mdiscord.types.meta import Enum
+from mdiscord.utils.utils import log
+
+if TYPE_CHECKING:
+    from mdiscord.websocket.opcodes import Opcodes
+
+
+class Handler_Overflow(Enum):
+    QUEUE = "queue"
+    """Event waits for a running call to finish"""
+    DROP = "drop"
+    """Handler is skipped for the event"""
+    LOG = "log"
+    """Handler is called anyway, logging that limit was exceeded"""
+
+
+class Handler_Limit:
+    """Bounds how long a handler runs and how many of it's calls run at once on a client
+
+    Parameters
+    ----------
+    timeout:
+        Seconds after which call is cancelled. `None` to not time out
+    max_concurrency:
+        Amount of calls running at once. `None` for unlimited
+    overflow:
+        What to do with an event when `max_concurrency` calls are already running
+
+    Example
+    -------
+    >>> class Client:
+    ...     handler_slots = {}
+    >>> async def slow(client, data):
+    ...     await asyncio.sleep(1)
+    ...     return True
+    >>> async def main():
+    ...     limit = Handler_Limit(timeout=0.01, max_concurrency=1, overflow="drop")
+    ...     data = Gateway_Payload(t="MESSAGE_CREATE", d={})
+    ...     results = await asyncio.gather(*(limit(Client(), slow, data) for _ in range(3)))
+    ...     return results, limit.dropped, limit.timeouts
+    >>> asyncio.run(main())
+    ([None, None, None], Counter({'MESSAGE_CREATE': 2}), Counter({'MESSAGE_CREATE': 1}))
+    """
+
+    def __init__(
+        self,
+        timeout: float | None = None,
+        max_concurrency: int | None = None,
+        overflow: Handler_Overflow | str = Handler_Overflow.QUEUE,
+    ):
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.overflow = Handler_Overflow(overflow)
+        self.dropped: Counter = Counter()
+        """Amount of events handler was skipped for"""
+        self.timeouts: Counter = Counter()
+        """Amount of calls that timed out per event"""
+
+    async def __call__(self, client: "Opcodes", function: Callable, data: Gateway_Payload) -> Any:
+        if not self.max_concurrency:
+            return await self._run(client, function, data)
+
+        if (slots := client.handler_slots.get(function)) is None:
+            slots = client.handler_slots[function] = asyncio.Semaphore(self.max_concurrency)
+        if slots.locked():
+            if self.overflow is Handler_Overflow.DROP:
+                self.dropped[data.t] += 1
+                return None
+            elif self.overflow is Handler_Overflow.LOG:
+                log.warning(
+                    "Handler %s exceeded %s concurrent calls on %s", function.__qualname__, self.max_concurrency, data.t
+                )
+                return await self._run(client, function, data)
+
+        async with slots:
+            return await self._run(client, function, data)
+
+    async def _run(self, client: "Opcodes", function: Callable, data: Gateway_Payload) -> Any:
+        if self.timeout is None:
+            return await function(client, data.d)
+        try:
+            return await asyncio.wait_for(function(client, data.d), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts[data.t] += 1
+            log.warning("Handler %s timed out after %ss on %s", function.__qualname__, self.timeout, data.t)
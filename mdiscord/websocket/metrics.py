@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+Event Metrics
+----------
+
+Histograms of received payload sizes, decode, queue and handler timings per event.
+
+:copyright: (c) 2024 Mmesek
+"""
+
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Callable, Iterable
+
+from mdiscord.types import Gateway_Opcodes, Gateway_Payload
+from mdiscord.utils.utils import log
+
+TIME_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+"""Upper bounds in seconds"""
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+"""Upper bounds in bytes"""
+
+
+class Histogram:
+    """Counts of observed values in buckets along with their sum and maximum
+
+    Example
+    -------
+    >>> histogram = Histogram((1, 10))
+    >>> for value in [0.5, 5, 50]:
+    ...     histogram.observe(value)
+    >>> histogram.counts, histogram.summary()
+    ([1, 1, 1], {'count': 3, 'sum': 55.5, 'mean': 18.5, 'max': 50})
+    """
+
+    __slots__ = ("buckets", "counts", "count", "sum", "max")
+
+    def __init__(self, buckets: tuple[float, ...] = TIME_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0
+
+    def summary(self) -> dict[str, float]:
+        return {"count": self.count, "sum": self.sum, "mean": self.mean, "max": self.max}
+
+
+def event_name(data: Gateway_Payload) -> str:
+    """Event of Dispatch payload or name of it's opcode otherwise"""
+    return data.t if data.op is Gateway_Opcodes.DISPATCH else data.op.name
+
+
+def handler_name(function: Callable) -> str:
+    return f"{function.__module__}.{function.__qualname__}"
+
+
+class Event_Metrics:
+    """Per event histograms of received bytes, decode time, time queued before dispatch and time spent in each handler
+
+    Parameters
+    ----------
+    slow_handler:
+        Seconds after which handler's call is logged as slow. `None` to not log
+
+    Example
+    -------
+    >>> async def on_message(client, message): ...
+    >>> metrics = Event_Metrics()
+    >>> metrics.received(100, 0.001, None)
+    >>> metrics.received(200, 0.002, Gateway_Payload(op=Gateway_Opcodes.DISPATCH, t="MESSAGE_CREATE"))
+    >>> metrics.handled("MESSAGE_CREATE", on_message, 0.5)
+    >>> metrics.bytes["MESSAGE_CREATE"].summary()
+    {'count': 1, 'sum': 300, 'mean': 300.0, 'max': 300}
+    >>> [(event, handler.__name__, histogram.max) for event, handler, histogram in metrics.slowest()]
+    [('MESSAGE_CREATE', 'on_message', 0.5)]
+    """
+
+    def __init__(self, slow_handler: float | None = 1):
+        self.slow_handler = slow_handler
+        self.bytes: dict[str, Histogram] = defaultdict(lambda: Histogram(SIZE_BUCKETS))
+        """Size of payloads, including every frame they were received in"""
+        self.decode: dict[str, Histogram] = defaultdict(Histogram)
+        """Seconds spent inflating and decoding payloads"""
+        self.queued: dict[str, Histogram] = defaultdict(Histogram)
+        """Seconds Dispatch payloads waited before being dispatched"""
+        self.handlers: dict[tuple[str, Callable], Histogram] = defaultdict(Histogram)
+        """Seconds spent in each handler per event"""
+        self._pending_bytes = 0
+        self._pending_seconds = 0.0
+
+    def received(self, size: int, seconds: float, data: Gateway_Payload | None) -> None:
+        """Records frame of `size` bytes decoded in `seconds`. `data` is `None` when frame didn't complete payload"""
+        self._pending_bytes += size
+        self._pending_seconds += seconds
+        if data is None:
+            return
+        event = event_name(data)
+        self.bytes[event].observe(self._pending_bytes)
+        self.decode[event].observe(self._pending_seconds)
+        self._pending_bytes = 0
+        self._pending_seconds = 0.0
+
+    def waited(self, event: str, seconds: float) -> None:
+        self.queued[event].observe(seconds)
+
+    def handled(self, event: str, function: Callable, seconds: float) -> None:
+        self.handlers[(event, function)].observe(seconds)
+        if self.slow_handler is not None and seconds >= self.slow_handler:
+            log.warning("Handler %s took %ss to handle %s", handler_name(function), round(seconds, 3), event)
+
+    def slowest(self, limit: int = 10, by: str = "max") -> list[tuple[str, Callable, Histogram]]:
+        """Handlers with highest `max`, `mean` or total (`sum`) time"""
+        ranked = sorted(self.handlers.items(), key=lambda item: getattr(item[1], by), reverse=True)
+        return [(event, function, histogram) for (event, function), histogram in ranked[:limit]]
+
+    def snapshot(self) -> dict[str, dict]:
+        """Summaries of every histogram"""
+        return {
+            "bytes": {event: h.summary() for event, h in self.bytes.items()},
+            "decode": {event: h.summary() for event, h in self.decode.items()},
+            "queued": {event: h.summary() for event, h in self.queued.items()},
+            "handlers": {
+                f"{event}:{handler_name(function)}": h.summary() for (event, function), h in self.handlers.items()
+            },
+        }
+
+    def prometheus(self, **labels: str) -> str:
+        """Renders metrics in Prometheus text format"""
+        return render([(labels, self)])
+
+
+FAMILIES = (
+    ("mdiscord_event_bytes", "Size of received payloads in bytes", "bytes"),
+    ("mdiscord_event_decode_seconds", "Time spent inflating and decoding payloads", "decode"),
+    ("mdiscord_event_queued_seconds", "Time Dispatch payloads waited before being dispatched", "queued"),
+    ("mdiscord_handler_seconds", "Time spent in handlers", "handlers"),
+)
+
+
+def _labels(labels: dict[str, str]) -> str:
+    return ",".join(f'{k}="{str(v)}"' for k, v in labels.items())
+
+
+def render(metrics: Iterable[tuple[dict[str, str], Event_Metrics]]) -> str:
+    """Renders metrics of multiple clients, each with it's own labels, in Prometheus text format
+
+    Example
+    -------
+    >>> metrics = Event_Metrics()
+    >>> metrics.waited("READY", 0.002)
+    >>> text = render([({"shard": 0}, metrics)])
+    >>> for line in text.splitlines():
+    ...     if "queued" in line and "_bucket" not in line:
+    ...         print(line)
+    # HELP mdiscord_event_queued_seconds Time Dispatch payloads waited before being dispatched
+    # TYPE mdiscord_event_queued_seconds histogram
+    mdiscord_event_queued_seconds_sum{shard="0",event="READY"} 0.002
+    mdiscord_event_queued_seconds_count{shard="0",event="READY"} 1
+    >>> [line for line in text.splitlines() if 'le="0.005"' in line]
+    ['mdiscord_event_queued_seconds_bucket{shard="0",event="READY",le="0.005"} 1']
+    """
+    metrics = list(metrics)
+    lines = []
+    for name, description, attribute in FAMILIES:
+        lines += [f"# HELP {name} {description}", f"# TYPE {name} histogram"]
+        for labels, metric in metrics:
+            for key, histogram in getattr(metric, attribute).items():
+                if attribute == "handlers":
+                    series = _labels({**labels, "event": key[0], "handler": handler_name(key[1])})
+                else:
+                    series = _labels({**labels, "event": key})
+                cumulative = 0
+                for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{series},le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{series}}} {histogram.sum}")
+                lines.append(f"{name}_count{{{series}}} {histogram.count}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Loop Monitor
+----------
+
+Measures event loop lag and reports what blocked it.
+
+:copyright: (c) 2024 Mmesek
+"""
+
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Callable
+
+from mdiscord.utils.utils import log
+from mdiscord.websocket.metrics import Histogram, handler_name
+from mdiscord.websocket.opcodes import DISPATCH, Opcodes
+
+STALLS_WINDOW = 50
+"""Amount of last stalls kept"""
+
+
+class Loop_Stall:
+    """Period in which event loop was blocked"""
+
+    __slots__ = ("started", "duration", "task", "event", "handler", "stack")
+
+    def __init__(self, task: str = None, event: str = None, handler: Callable = None, stack: list[str] = None):
+        self.started = time.time()
+        self.duration: float = None
+        """Seconds loop was blocked for. `None` while it still is"""
+        self.task = task
+        """Name of task that was running"""
+        self.event = event
+        """Event that was being dispatched"""
+        self.handler = handler
+        """Handler to which event was being dispatched"""
+        self.stack = stack or []
+        """Stack of loop's thread captured once it was blocked past threshold"""
+
+    def __repr__(self) -> str:
+        return f"Loop_Stall(duration={self.duration}, task={self.task}, event={self.event}, handler={self.handler})"
+
+
+class Loop_Monitor:
+    """Samples event loop scheduling lag. When loop doesn't run for `threshold` seconds, a watchdog thread captures
+    the stack of loop's thread along with event and handler being dispatched, which is logged once loop resumes.
+
+    Handler is found on the captured stack, so calls running in executor workers or batch deliveries are attributed
+    as well. Handler running in it's own task due to `timeout` is recognized by it's coroutine, with event known only
+    when it listens to a single one. Tasks spawned by handlers themselves aren't attributed to them
+
+    Parameters
+    ----------
+    threshold:
+        Seconds of lag after which loop is considered blocked
+    interval:
+        Seconds between samples
+
+    Example
+    -------
+    >>> async def main():
+    ...     monitor = Loop_Monitor(threshold=0.05, interval=0.01)
+    ...     monitor.start()
+    ...     await asyncio.sleep(0.02)
+    ...     time.sleep(0.2)
+    ...     await asyncio.sleep(0.05)
+    ...     monitor.stop()
+    ...     return (
+    ...         len(monitor.stalls),
+    ...         monitor.stalls[0].duration > 0.1,
+    ...         "time.sleep(0.2)" in monitor.stalls[0].stack[-1],
+    ...     )
+    >>> asyncio.run(main())
+    (1, True, True)
+
+    Stall within a handler running in a separate task is attributed to it
+
+    >>> from mdiscord.types import Gateway_Payload
+    >>> def blocking(client, data):
+    ...     time.sleep(0.2)
+    >>> async def handler(client, data):
+    ...     blocking(client, data)
+    >>> async def main():
+    ...     monitor = Loop_Monitor(threshold=0.05, interval=0.01)
+    ...     monitor.start()
+    ...     await asyncio.sleep(0.02)
+    ...     await asyncio.ensure_future(Opcodes()._run_handler(handler, Gateway_Payload(t="TEST_EVENT", d={})))
+    ...     await asyncio.sleep(0.05)
+    ...     monitor.stop()
+    ...     return monitor.stalls[0].event, monitor.stalls[0].handler is handler
+    >>> asyncio.run(main())
+    ('TEST_EVENT', True)
+    """
+
+    def __init__(self, threshold: float = 0.5, interval: float = 0.1):
+        self.threshold = threshold
+        self.interval = interval
+        self.lag = Histogram()
+        """Scheduling lag of each sample"""
+        self.stalls: deque[Loop_Stall] = deque(maxlen=STALLS_WINDOW)
+        """Last periods in which loop was blocked past threshold"""
+        self._stall: Loop_Stall = None
+        self._beat = time.monotonic()
+        self._stopped = threading.Event()
+        self._loop: asyncio.AbstractEventLoop = None
+        self._thread_id: int = None
+        self._sampler: asyncio.Task = None
+
+    def start(self) -> None:
+        """Starts sampling on running loop and watchdog thread"""
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._sampler = self._loop.create_task(self._sample(), name="Loop Monitor")
+        threading.Thread(target=self._watch, name="Loop Monitor", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._sampler:
+            self._sampler.cancel()
+
+    async def _sample(self) -> None:
+        while True:
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(time.monotonic() - self._beat - self.interval, 0)
+            self.lag.observe(lag)
+            if stall := self._stall:
+                stall.duration = lag
+                self.stalls.append(stall)
+                self._stall = None
+                log.warning(
+                    "Event loop was blocked for %ss in task %s while dispatching %s to %s:\n%s",
+                    round(lag, 3),
+                    stall.task,
+                    stall.event,
+                    handler_name(stall.handler) if stall.handler else None,
+                    "".join(stall.stack),
+                )
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.interval):
+            if self._stall is None and time.monotonic() - self._beat > self.interval + self.threshold:
+                self._stall = self._capture()
+
+    def _capture(self) -> Loop_Stall:
+        """Captures stack of loop's thread and finds payload being dispatched in it"""
+        frame = sys._current_frames().get(self._thread_id)
+        task = asyncio.current_task(self._loop)
+        stall = Loop_Stall(task=task.get_name() if task else None, stack=traceback.format_stack(frame))
+
+        while frame is not None:
+            if frame.f_code in _DISPATCHING:
+                data = frame.f_locals.get("data")
+                stall.event = getattr(data, "t", None)
+                stall.handler = frame.f_locals.get("function")
+                break
+            frame = frame.f_back
+        else:
+            if task and (coroutine := getattr(task.get_coro(), "cr_code", None)):
+                stall.event, stall.handler = _handler_of(coroutine)
+        return stall
+
+
+_DISPATCHING = {Opcodes.dispatch.__code__, Opcodes._run_handler.__code__}
+"""Code of functions which locals hold `data` being dispatched and handler `function` it's dispatched to"""
+
+
+def _handler_of(code) -> tuple[str | None, Callable | None]:
+    """Registered handler with code of task's coroutine and event it listens to, if there is only one"""
+    events = set()
+    handler = None
+    for event, priorities in DISPATCH.items():
+        for functions in priorities.values():
+            for function in functions:
+                if getattr(function, "__code__", None) is code:
+                    handler = function
+                    events.add(event)
+    return events.pop() if len(events) == 1 else None, handler
@@ -8,11 +8,11 @@ Discord API Opcodes.
 :copyright: (c) 2020 Mmesek
 """
 
-import asyncio, platform
+import asyncio, math, platform, random
 import sys, time, traceback
-from collections import Counter
+from collections import Counter, deque
 from inspect import getfullargspec
-from typing import Callable, Optional, get_args
+from typing import Any, Awaitable, Callable, Optional, get_args
 from datetime import datetime
 
 from mdiscord.exceptions import BadRequest, Insufficient_Permissions, JsonBadRequest, NotFound, SoftError, UserError
@@ -34,6 +34,12 @@ from mdiscord.types import (
 )
 from mdiscord.utils.utils import EventListener, log
 from mdiscord.utils.routes import opcode
+from mdiscord.websocket.batch import Batch_Collector
+from mdiscord.websocket.intents import event_intent, intents_report
+from mdiscord.websocket.limits import Handler_Limit, Handler_Overflow
+from mdiscord.websocket.metrics import Event_Metrics
+from mdiscord.websocket.predicates import Dispatch_Plan
+from mdiscord.websocket.ratelimit import Identify_Limiter
 from collections import defaultdict
 
 DISPATCH: dict[Gateway_Events, dict[int, list[Callable[["Opcodes", DiscordObject], bool]]]] = defaultdict(
@@ -44,18 +50,61 @@ PREDICATES: dict[
     Gateway_Events, dict[Callable[["Opcodes", DiscordObject], bool], list[Callable[[DiscordObject], bool]]]
 ] = defaultdict(lambda: defaultdict(list))
 """Registry containing event names with corresponding mapping of functions with lists of required predicates"""
+LIMITS: dict[Callable[["Opcodes", DiscordObject], bool], Handler_Limit] = {}
+"""Registry containing functions with their timeouts and concurrency limits"""
+BATCHES: dict[Callable[["Opcodes", list[DiscordObject]], bool], tuple[int, float]] = {}
+"""Registry containing functions receiving events in batches with batch size and window in seconds"""
 INTENTS = 0
 """Required Intents value to execute all registered functions"""
+LATENCY_WINDOW = 100
+"""Amount of last heartbeat latencies kept"""
+RESUMABLE_CLOSE_CODE = 4000
+"""Close code used when closing connection to resume. Anything but 1000 & 1001 keeps session resumable"""
+PLANS: dict[str, Dispatch_Plan] = {}
+"""Cache of flattened, priority ordered functions with their predicates per event. Invalidated when registering"""
+
+
+def plan(event: str) -> Dispatch_Plan:
+    """
+    Returns functions with their predicates registered for event in order of priority
+
+    Example
+    -------
+    >>> @onDispatch(event="guild_ban_add", priority=10)
+    ... async def first(_, ban): ...
+    >>> @onDispatch(event="guild_ban_add", predicate=bool)
+    ... async def second(_, ban): ...
+    >>> plan("GUILD_BAN_ADD").functions == [(first, ()), (second, (bool,))]
+    True
+    """
+    if (functions := PLANS.get(event)) is None:
+        predicates = PREDICATES.get(event, {})
+        functions = PLANS[event] = Dispatch_Plan(
+            [
+                (function, tuple(predicates.get(function, [])))
+                for priority in sorted(DISPATCH.get(event, {}))
+                for function in DISPATCH[event][priority]
+            ]
+        )
+    return functions
 
 
 class Opcodes(EventListener):
     counters: Counter = Counter()
     keepConnection: bool = True
     latency: float = 0.0
+    latencies: deque[float]
+    """Rolling window of last heartbeat latencies"""
     heartbeat_sent: float = 0.0
+    heartbeat_acked: bool = True
     heartbeating: asyncio.Task
     session_id: str = None
     resume_url: str = None
+    last_sequence: int = None
+    identify_limiter: Identify_Limiter = None
+    event_metrics: Event_Metrics = None
+    intents: int | str = 0
+    extra_intents: int = 0
 
     async def prepare_payload(self, data: Gateway_Payload):
         try:
@@ -70,56 +119,104 @@ class Opcodes(EventListener):
         if getattr(data.d, "is_bot", False):
             data.t = "BOT_" + data.t
 
+    def unhandled(self, event: str) -> bool:
+        """Whether event has neither handlers nor listeners registered
+
+        Example
+        -------
+        >>> @onDispatch(event="bot_message_create")
+        ... async def from_bot(_, message): ...
+        >>> Opcodes().unhandled("BOT_MESSAGE_CREATE"), Opcodes().unhandled("BOT_DIRECT_MESSAGE_CREATE")
+        (False, True)
+        """
+        return (
+            not plan(event).functions
+            and event not in getattr(self, "_listeners", {})
+            and event not in getattr(self, "_keyed_listeners", {})
+        )
+
     async def dispatch(self, data: Gateway_Payload) -> None:
         self.counters[data.t] += 1
         if self.check_listeners(data.t, data.d):
             return
 
         _completed = {}  # Cached result so we don't check same predicate for one payload multiple times
-        for priority in sorted(DISPATCH.get(data.t, {})):
-            for function in DISPATCH[data.t][priority]:
-                try:
-                    for predicate in PREDICATES.get(data.t, {}).get(function, []):
-                        if not _completed.get(predicate, predicate(data.d)):
-                            _completed[predicate] = False
-                            break
-                    else:
-                        if await function(self, data.d):
-                            return
-                except UserError as ex:
-                    log.debug(ex)
-                    channel_id = getattr(data.d, "channel_id")
-                    if channel_id:
-                        await self.create_message(channel_id=channel_id, content=str(ex))
-                except JsonBadRequest as ex:
-                    log.warn("JSON Bad Request", exc_info=ex)
-                except BadRequest as ex:
-                    log.warn("Bad Request", exc_info=ex)
-                except NotFound as ex:
-                    log.warn(ex)
-                except Insufficient_Permissions as ex:
-                    log.info("Insufficient Permissions", exc_info=ex)
-                except TypeError as ex:
-                    t = traceback.extract_tb(sys.exc_info()[2], limit=-1)
-                    if "missing" in str(ex):
-                        error = str(ex).split(" ", 1)[1]
-                        err = f"{sys.exc_info()}"
-                        log.debug("Missing argument:", exc_info=ex)
-                        # await self.message(data['d']['channel_id'], error.capitalize())
-                    else:
-                        log.warn("Error occured:", exc_info=ex)
-                        # print('Error occured:', ex)
-                        # print(sys.exc_info())
-                        # print(t)
-                except SoftError as ex:
-                    log.debug(ex)
-                except Exception as ex:
-                    t = traceback.extract_tb(sys.exc_info()[2], limit=-1)
-                    log.exception("Dispatch Error %s: %s at %s", type(ex), ex, t, exc_info=ex)
+        for function, predicates in plan(data.t).match(data.d):
+            try:
+                for predicate in predicates:
+                    if (result := _completed.get(predicate)) is None:
+                        result = _completed[predicate] = bool(predicate(data.d))
+                    if not result:
+                        break
+                else:
+                    if await self._call(function, data):
+                        return
+            except UserError as ex:
+                log.debug(ex)
+                channel_id = getattr(data.d, "channel_id")
+                if channel_id:
+                    await self.create_message(channel_id=channel_id, content=str(ex))
+            except JsonBadRequest as ex:
+                log.warn("JSON Bad Request", exc_info=ex)
+            except BadRequest as ex:
+                log.warn("Bad Request", exc_info=ex)
+            except NotFound as ex:
+                log.warn(ex)
+            except Insufficient_Permissions as ex:
+                log.info("Insufficient Permissions", exc_info=ex)
+            except TypeError as ex:
+                t = traceback.extract_tb(sys.exc_info()[2], limit=-1)
+                if "missing" in str(ex):
+                    error = str(ex).split(" ", 1)[1]
+                    err = f"{sys.exc_info()}"
+                    log.debug("Missing argument:", exc_info=ex)
+                    # await self.message(data['d']['channel_id'], error.capitalize())
+                else:
+                    log.warn("Error occured:", exc_info=ex)
+                    # print('Error occured:', ex)
+                    # print(sys.exc_info())
+                    # print(t)
+            except SoftError as ex:
+                log.debug(ex)
+            except Exception as ex:
+                t = traceback.extract_tb(sys.exc_info()[2], limit=-1)
+                log.exception("Dispatch Error %s: %s at %s", type(ex), ex, t, exc_info=ex)
+
+    def _call(self, function: Callable, data: Gateway_Payload) -> Awaitable:
+        """Calls handler within it's limits if it has any or adds event to it's batch"""
+        if function in BATCHES:
+            return self._collect(function, data)
+        return self._run_handler(function, data)
+
+    async def _collect(self, function: Callable, data: Gateway_Payload) -> None:
+        """Adds event to batch of function for that event"""
+        if (collector := self.batch_collectors.get((function, data.t))) is None:
+            size, window = BATCHES[function]
+            event = data.t
+
+            def deliver(items: list) -> Awaitable:
+                return self._run_handler(function, Gateway_Payload(op=Gateway_Opcodes.DISPATCH, t=event, d=items))
+
+            collector = self.batch_collectors[(function, event)] = Batch_Collector(deliver, size, window)
+        collector.add(data.d)
+
+    async def _run_handler(self, function: Callable, data: Gateway_Payload) -> Any:
+        """Calls handler within it's limits, timing the call when `event_metrics` are enabled"""
+        if limit := LIMITS.get(function):
+            call = limit(self, function, data)
+        else:
+            call = function(self, data.d)
+        if not self.event_metrics:
+            return await call
+        started = time.perf_counter()
+        try:
+            return await call
+        finally:
+            self.event_metrics.handled(data.t, function, time.perf_counter() - started)
 
     async def reconnect(self, data: Gateway_Payload) -> None:
         log.info("Reconnecting %s", self.username)
-        await self.resume()
+        await self._ws.close(code=RESUMABLE_CLOSE_CODE)
 
     async def invalid_session(self, data: Gateway_Payload) -> None:
         log.info("Invalid Session")
@@ -128,6 +225,7 @@ class Opcodes(EventListener):
             await self.resume()
         else:
             log.info("Reidentifying after Invalid Session")
+            self.session_id = None
             await self.identify()
 
     async def hello(self, data: Gateway_Payload) -> None:
@@ -138,16 +236,36 @@ class Opcodes(EventListener):
             await self.identify()
 
     async def heartbeat_ack(self, data: Gateway_Payload) -> None:
+        self.heartbeat_acked = True
         self.latency = time.perf_counter() - self.heartbeat_sent
+        self.latencies.append(self.latency)
         if self.latency > 5:
             log.debug(f"Last heartbeat latency {self.latency}s")
 
+    def latency_percentile(self, percentile: float = 50) -> float:
+        """
+        Returns latency at percentile of last heartbeats
+
+        Example
+        -------
+        >>> op = Opcodes()
+        >>> op.latencies.extend([0.1, 0.3, 0.2, 0.9])
+        >>> op.latency_percentile(50), op.latency_percentile(99)
+        (0.2, 0.9)
+        """
+        if not self.latencies:
+            return self.latency
+        latencies = sorted(self.latencies)
+        return latencies[max(math.ceil(len(latencies) * percentile / 100) - 1, 0)]
+
     # User
-    async def send(self, _json: object):
+    async def send(self, _json: object, heartbeat: bool = False):
         raise NotImplementedError
 
     @opcode(log="Identifing")
     async def identify(self) -> None:
+        if self.identify_limiter:
+            await self.identify_limiter.acquire(self.shards[0])
         return Identify(
             token=self.token,
             properties=Identify_Connection_Properties(os=platform.system(), browser="mdiscord", device="mdiscord"),
@@ -155,18 +273,62 @@ class Opcodes(EventListener):
             large_threshold=250,
             shard=self.shards,
             presence=self.presence,
-            intents=self.intents,
+            intents=self.identify_intents(),
         )
 
+    def identify_intents(self) -> int:
+        """Intents to identify with. When configured as `auto`, intents required by registered handlers
+        along with `extra_intents`, as intents of events awaited with `wait_for` or `events`
+        and of fields such as `MESSAGE_CONTENT` can't be inferred from handlers
+
+        Example
+        -------
+        >>> from mdiscord.types import Intents
+        >>> client = Opcodes()
+        >>> client.intents, client.extra_intents = "auto", Intents.MESSAGE_CONTENT
+        >>> client.identify_intents() == INTENTS | Intents.MESSAGE_CONTENT
+        True
+        """
+        if self.intents == "auto":
+            return INTENTS | self.extra_intents
+        return self.intents
+
+    def unused_intents(self) -> dict:
+        """Configured intents that no registered handler requires with estimate of bandwidth they take
+        when `event_metrics` are enabled"""
+        return intents_report(self.identify_intents(), INTENTS, self.event_metrics)
+
     async def heartbeat(self, interval: int) -> None:
         self.keepConnection = True
+        self.heartbeat_acked = True
         log.debug(f"Initiated Heartbeat at interval {interval / 1000}s")
+        await asyncio.sleep(interval / 1000 * random.random())
         while self.keepConnection:
-            await asyncio.sleep(interval / 1000)
+            if self.missed_ack():
+                await self.close_zombie()
+                break
+            self.heartbeat_acked = False
             self.heartbeat_sent = time.perf_counter()
-            await self._ws.send_json({"op": 1, "d": self.last_sequence})
+            await self.send({"op": 1, "d": self.last_sequence}, heartbeat=True)
+            await asyncio.sleep(interval / 1000)
         log.info("Heartbeat stopped")
 
+    def missed_ack(self) -> bool:
+        """Whether last heartbeat wasn't acknowledged. Acknowledgement isn't considered missed while reader is
+        held back by full dispatch queue, as it might be waiting unread behind Dispatch payloads"""
+        if self.heartbeat_acked:
+            return False
+        if (executor := getattr(self, "executor", None)) and executor.blocked_since(self.heartbeat_sent):
+            log.warning("Heartbeat wasn't acknowledged yet while reader waits for room in dispatch queue")
+            return False
+        return True
+
+    async def close_zombie(self) -> None:
+        """Closes connection which didn't acknowledge last heartbeat keeping session resumable"""
+        log.warning("Heartbeat was not acknowledged, closing zombie connection of %s", self.username)
+        self.keepConnection = False
+        await self._ws.close(code=RESUMABLE_CLOSE_CODE)
+
     @opcode(log="Resuming")
     async def resume(self) -> None:
         return Resume(token=self.token, session_id=self.session_id, seq=self.last_sequence)
@@ -222,6 +384,9 @@ class Opcodes(EventListener):
 
     def __init__(self):
         self.opcodes = {i.value: getattr(self, i.name.lower()) for i in Gateway_Opcodes}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.handler_slots: dict[Callable, asyncio.Semaphore] = {}
+        self.batch_collectors: dict[tuple[Callable, str], Batch_Collector] = {}
 
 
 def onDispatch(
@@ -230,6 +395,11 @@ def onDispatch(
     event: str | Gateway_Events = None,
     optional: bool = False,
     predicate: Callable | list[Callable] = None,
+    timeout: float = None,
+    max_concurrency: int = None,
+    overflow: Handler_Overflow | str = Handler_Overflow.QUEUE,
+    batch: int = None,
+    batch_window: float = 1000,
 ):
     """
     Decorator to register function as a listener for Event from Dispatch
@@ -247,7 +417,19 @@ def onDispatch(
         Whether this listener should be excluded from Intent calculation.
         For example, if execution is optional
     predicate:
-        Predicate(s) which has to be met in order to call this function
+        Predicate(s) which has to be met in order to call this function.
+        Declarative `Field` predicates are indexed so functions are looked up by payload's value instead
+    timeout:
+        Seconds after which call is cancelled and dispatching continues with next function
+    max_concurrency:
+        Amount of calls of this function that can run at once on a client
+    overflow:
+        Whether to `queue`, `drop` or only `log` an event when `max_concurrency` calls are already running
+    batch:
+        Amount of events to collect before calling function once with a list of them.
+        Batches are collected per client and limits apply to each call with a batch
+    batch_window:
+        Milliseconds after first collected event after which function is called with batch even if it's not full
 
     Example
     -------
@@ -305,6 +487,31 @@ def onDispatch(
     ... async def message_update(_, msg): ...
     >>> all(p in PREDICATES["MESSAGE_UPDATE"][message_update] for p in [predicate_a, predicate_b])
     True
+
+    Or declaratively, to be looked up by value rather than checked one by one:
+    >>> from mdiscord.websocket.predicates import Field
+    >>> @onDispatch(event="message_create", predicate=Field("guild_id") == 1)
+    ... async def guild_message(_, msg): ...
+    >>> @onDispatch(event="message_create", predicate=Field("channel_id").in_({2, 3}))
+    ... async def channel_message(_, msg): ...
+    >>> [f.__name__ for f, _ in plan("MESSAGE_CREATE").match({"guild_id": 1, "channel_id": 3})]
+    ['enum_value', 'message_create', 'guild_message', 'channel_message']
+    >>> [f.__name__ for f, _ in plan("MESSAGE_CREATE").match({"guild_id": 2, "channel_id": 4})]
+    ['enum_value', 'message_create']
+
+    ### Limits
+
+    Bound how long a function runs and how many of it's calls run at once:
+    >>> @onDispatch(event="message_reaction_add", timeout=5, max_concurrency=10, overflow="drop")
+    ... async def limited(_, reaction): ...
+    >>> LIMITS[limited].max_concurrency, LIMITS[limited].overflow
+    (10, <Handler_Overflow.DROP: 'drop'>)
+
+    Receive events in batches of up to 100, delivered at most 500ms after first one:
+    >>> @onDispatch(event="typing_start", batch=100, batch_window=500)
+    ... async def bulk(_, events: list): ...
+    >>> BATCHES[bulk]
+    (100, 0.5)
     """
 
     def inner(f):
@@ -324,17 +531,22 @@ def onDispatch(
             if type(name) is str and clean_name(name) not in Gateway_Events._member_names_:
                 # Make sure we only add valid events
                 continue
-            _name = Gateway_Events.by_str(clean_name(name))
 
             if not optional:
                 global INTENTS
-                INTENTS |= _name.annotation(0)
+                INTENTS |= event_intent(name)
 
             name = name.upper()
             if predicate:
                 PREDICATES[name][f] += predicate if type(predicate) is list else [predicate]
 
             DISPATCH[name][priority].append(f)
+            PLANS.pop(name, None)
+
+        if timeout or max_concurrency:
+            LIMITS[f] = Handler_Limit(timeout, max_concurrency, overflow)
+        if batch:
+            BATCHES[f] = (batch, batch_window / 1000)
 
         return f
 
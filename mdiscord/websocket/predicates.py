@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Declarative Predicates
+----------
+
+Predicates on payload's fields that can be indexed when dispatching.
+
+:copyright: (c) 2024 Mmesek
+"""
+
+from typing import Any, Callable, Iterable
+
+from mdiscord.types import DiscordObject
+from mdiscord.utils.utils import get_field
+
+
+class Field:
+    """Field of a payload to compare against. Nested fields are separated with a dot
+
+    Example
+    -------
+    >>> Field("guild_id") == 1
+    Is(guild_id in {1})
+    >>> Field("channel_id").in_([1, 2])
+    Is(channel_id in {1, 2})
+    >>> Field("author.bot").is_(True)({"author": {"bot": True}})
+    True
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._attrs = path.split(".")
+
+    def get(self, data: DiscordObject | dict) -> Any:
+        return get_field(data, self._attrs)
+
+    def __eq__(self, value: Any) -> "Is":
+        return Is(self, [value])
+
+    def in_(self, values: Iterable[Any]) -> "Is":
+        return Is(self, values)
+
+    is_ = __eq__
+
+    __hash__ = None
+
+
+class Is:
+    """Predicate met when payload's field has one of the values"""
+
+    def __init__(self, field: Field, values: Iterable[Any]):
+        self.field = field
+        self.values = frozenset(values)
+
+    def __call__(self, data: DiscordObject | dict) -> bool:
+        try:
+            return self.field.get(data) in self.values
+        except TypeError:
+            return False
+
+    def __repr__(self) -> str:
+        return f"Is({self.field.path} in {set(self.values)})"
+
+
+class Dispatch_Plan:
+    """Priority ordered functions with their predicates registered for an event.
+    Functions having an `Is` predicate are indexed by it's values so only matching ones are checked
+
+    Example
+    -------
+    >>> async def a(_, d): ...
+    >>> async def b(_, d): ...
+    >>> async def c(_, d): ...
+    >>> plan = Dispatch_Plan([(a, (Field("guild_id") == 1,)), (b, ()), (c, (Field("guild_id").in_([2, 3]), bool))])
+    >>> [f.__name__ for f, _ in plan.match({"guild_id": 3})]
+    ['b', 'c']
+    >>> [f.__name__ for f, _ in plan.match({"guild_id": 1})]
+    ['a', 'b']
+    """
+
+    def __init__(self, functions: list[tuple[Callable, tuple[Callable, ...]]]):
+        self.functions = functions
+        self._remaining: list[tuple[Callable, tuple[Callable, ...]]] = []
+        self._unindexed: list[int] = []
+        self._indexes: dict[str, tuple[Field, dict[Any, list[int]]]] = {}
+
+        for position, (function, predicates) in enumerate(functions):
+            indexed = next((predicate for predicate in predicates if isinstance(predicate, Is)), None)
+            if indexed:
+                _, index = self._indexes.setdefault(indexed.field.path, (indexed.field, {}))
+                for value in indexed.values:
+                    index.setdefault(value, []).append(position)
+                predicates = tuple(predicate for predicate in predicates if predicate is not indexed)
+            else:
+                self._unindexed.append(position)
+            self._remaining.append((function, predicates))
+
+    def match(self, data: DiscordObject | dict) -> list[tuple[Callable, tuple[Callable, ...]]]:
+        """Returns functions which indexed predicate is met by payload along with predicates left to check"""
+        if not self._indexes:
+            return self._remaining
+
+        positions = list(self._unindexed)
+        for field, index in self._indexes.values():
+            try:
+                positions.extend(index.get(field.get(data), ()))
+            except TypeError:
+                continue
+        positions.sort()
+        return [self._remaining[position] for position in positions]
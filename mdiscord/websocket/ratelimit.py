@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Gateway Rate Limits
+----------
+
+Limiters of messages sent over Gateway.
+
+:copyright: (c) 2024 Mmesek
+"""
+
+import asyncio
+import time
+
+from mdiscord.types import Session_Start_Limit
+from mdiscord.utils.utils import log
+
+IDENTIFY_WINDOW = 5
+"""Seconds in which each concurrency bucket can send one IDENTIFY"""
+SESSION_START_WINDOW = 24 * 60 * 60
+"""Seconds after which session start limit resets"""
+SEND_LIMIT = 120
+"""Amount of messages that can be sent over a connection within `SEND_WINDOW`"""
+SEND_WINDOW = 60
+"""Seconds in which at most `SEND_LIMIT` messages can be sent"""
+
+
+class Identify_Limiter:
+    """Gates IDENTIFY so shards in the same bucket (`shard_id % max_concurrency`) identify at most once per 5 seconds
+    and no more sessions are started than `remaining` allows until it resets
+
+    Parameters
+    ----------
+    max_concurrency:
+        Amount of buckets allowed to identify in parallel
+    remaining:
+        Remaining session starts. `None` to not track
+    reset_after:
+        Milliseconds after which `remaining` is reset to `total`
+    total:
+        Session starts available after reset
+
+    Example
+    -------
+    >>> async def main():
+    ...     limiter = Identify_Limiter(max_concurrency=2)
+    ...     start = time.monotonic()
+    ...     await asyncio.gather(*(limiter.acquire(shard) for shard in range(2)))
+    ...     return round(time.monotonic() - start)
+    >>> asyncio.run(main())
+    0
+    """
+
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, max_concurrency: int = 1, remaining: int = None, reset_after: int = 0, total: int = None):
+        self.max_concurrency = max(max_concurrency or 1, 1)
+        self.remaining = remaining
+        self.total = total
+        self.reset_at = self.clock() + (reset_after or 0) / 1000
+        self._identified: list[float] = [-IDENTIFY_WINDOW] * self.max_concurrency
+
+    @classmethod
+    def from_limit(cls, limit: Session_Start_Limit, **kwargs) -> "Identify_Limiter":
+        def value(v):
+            return v if isinstance(v, int) else None
+
+        return cls(
+            value(limit.max_concurrency) or 1,
+            value(limit.remaining),
+            value(limit.reset_after) or 0,
+            value(limit.total),
+            **kwargs,
+        )
+
+    def _reserve(self, bucket: int) -> float:
+        """Reserves IDENTIFY for bucket. Returns seconds to wait if it's not allowed yet"""
+        now = self.clock()
+        if self.remaining is not None and self.remaining <= 0:
+            if self.reset_at > now:
+                return self.reset_at - now
+            self.remaining = self.total
+            self.reset_at = now + SESSION_START_WINDOW
+
+        delay = self._identified[bucket] + IDENTIFY_WINDOW - now
+        if delay > 0:
+            return delay
+
+        self._identified[bucket] = now
+        if self.remaining is not None:
+            self.remaining -= 1
+        return 0
+
+    async def acquire(self, shard_id: int) -> None:
+        """Waits until shard is allowed to IDENTIFY"""
+        bucket = shard_id % self.max_concurrency
+        while delay := self._reserve(bucket):
+            if delay > IDENTIFY_WINDOW:
+                log.warning("Session start limit exhausted, waiting %ss before identifying shard %s", delay, shard_id)
+            await asyncio.sleep(delay)
+
+
+class Send_Limiter:
+    """Token bucket for messages sent over a Gateway connection with tokens reserved for heartbeats.
+    Regular sends wait in order of arrival when there are no unreserved tokens left.
+    Bucket holds half of the limit and refills the other half over the window,
+    so no more than `limit` messages are sent within any window
+
+    Parameters
+    ----------
+    limit:
+        Amount of messages allowed within window
+    window:
+        Seconds of the window
+    reserved:
+        Tokens only heartbeats can use
+
+    Example
+    -------
+    >>> async def main():
+    ...     limiter = Send_Limiter(limit=4, window=60, reserved=1)
+    ...     await limiter.acquire()
+    ...     try:
+    ...         await asyncio.wait_for(limiter.acquire(), 0.01)
+    ...     except asyncio.TimeoutError:
+    ...         await limiter.acquire(heartbeat=True)
+    ...     return limiter.tokens < 1
+    >>> asyncio.run(main())
+    True
+    """
+
+    def __init__(self, limit: int = SEND_LIMIT, window: float = SEND_WINDOW, reserved: int = 2):
+        self.capacity = limit / 2
+        self.rate = (limit - self.capacity) / window
+        self.reserved = reserved
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.queued: int = 0
+        """Amount of regular sends waiting for a token"""
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def _take(self, reserved: int) -> None:
+        while True:
+            self._refill()
+            if self.tokens - reserved >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 + reserved - self.tokens) / self.rate)
+
+    async def acquire(self, heartbeat: bool = False) -> None:
+        """Waits until message can be sent"""
+        if heartbeat:
+            return await self._take(0)
+        self.queued += 1
+        try:
+            async with self._lock:
+                await self._take(self.reserved)
+        finally:
+            self.queued -= 1
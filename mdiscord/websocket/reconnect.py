@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Reconnect Policy
+----------
+
+Decides how and when to reconnect after Gateway connection was closed.
+
+:copyright: (c) 2024 Mmesek
+"""
+
+import random
+import time
+from collections import deque
+
+from mdiscord.types import Gateway_Close_Event_Codes
+from mdiscord.types.meta import Enum
+
+
+class Reconnect_Action(Enum):
+    RESUME = "resume"
+    """Reconnect and resume current session"""
+    IDENTIFY = "identify"
+    """Reconnect and start a new session"""
+    FATAL = "fatal"
+    """Do not reconnect"""
+
+
+IDENTIFY_CODES = {
+    Gateway_Close_Event_Codes.NOT_AUTHENTICATED.value,
+    Gateway_Close_Event_Codes.INVALID_SEQ.value,
+    Gateway_Close_Event_Codes.SESSION_TIMED_OUT.value,
+}
+"""Close codes after which session can't be resumed"""
+FATAL_CODES = {
+    Gateway_Close_Event_Codes.AUTHENTICATION_FAILED.value,
+    Gateway_Close_Event_Codes.INVALID_SHARD.value,
+    Gateway_Close_Event_Codes.SHARDING_REQUIRED.value,
+    Gateway_Close_Event_Codes.INVALID_API_VERSION.value,
+    Gateway_Close_Event_Codes.INVALID_INTENT.value,
+    Gateway_Close_Event_Codes.DISALLOWED_INTENT.value,
+}
+"""Close codes after which reconnecting would fail again"""
+
+
+class Reconnect_Policy:
+    """Reconnect state machine with exponential backoff and full jitter.
+    Backoff grows with each disconnect until a session is successfully started or resumed
+
+    Parameters
+    ----------
+    base:
+        Seconds of backoff after first failed attempt
+    cap:
+        Maximum seconds of backoff
+
+    Example
+    -------
+    >>> policy = Reconnect_Policy()
+    >>> policy.disconnected(4009)
+    <Reconnect_Action.IDENTIFY: 'identify'>
+    >>> policy.disconnected(1006)
+    <Reconnect_Action.RESUME: 'resume'>
+    >>> policy.disconnected(4014)
+    <Reconnect_Action.FATAL: 'fatal'>
+    >>> 0 <= policy.delay() <= 4
+    True
+    >>> policy.connected() >= 0, policy.attempt
+    (True, 0)
+    """
+
+    def __init__(self, base: float = 1, cap: float = 60):
+        self.base = base
+        self.cap = cap
+        self.attempt = 0
+        """Amount of disconnects since last successful connection"""
+        self.durations: deque[float] = deque(maxlen=100)
+        """Seconds it took to reconnect, from disconnect to READY or RESUMED"""
+        self._disconnected_at: float = None
+
+    @staticmethod
+    def classify(code: int | None) -> Reconnect_Action:
+        if code in FATAL_CODES:
+            return Reconnect_Action.FATAL
+        if code in IDENTIFY_CODES:
+            return Reconnect_Action.IDENTIFY
+        return Reconnect_Action.RESUME
+
+    def disconnected(self, code: int | None) -> Reconnect_Action:
+        """Registers disconnect and returns what should be done next"""
+        if self._disconnected_at is None:
+            self._disconnected_at = time.monotonic()
+        self.attempt += 1
+        return self.classify(code)
+
+    def delay(self) -> float:
+        """Seconds to wait before next attempt"""
+        if self.attempt <= 1:
+            return random.uniform(0, self.base)
+        return random.uniform(0, min(self.cap, self.base * 2 ** (self.attempt - 1)))
+
+    def connected(self) -> float:
+        """Registers successful session start or resume. Returns how long reconnecting took"""
+        duration = 0.0
+        if self._disconnected_at is not None:
+            duration = time.monotonic() - self._disconnected_at
+            self.durations.append(duration)
+        self._disconnected_at = None
+        self.attempt = 0
+        return duration
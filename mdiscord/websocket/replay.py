@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Gateway Record & Replay
+----------
+
+Records raw Gateway frames and replays them through decoding and dispatching without network.
+
+:copyright: (c) 2024 Mmesek
+"""
+
+import asyncio
+import struct
+import time
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+from mdiscord.types import Gateway_Opcodes
+from mdiscord.utils.serializer import Deserializer
+from mdiscord.websocket.opcodes import Opcodes
+
+MAGIC = b"MDGW\x01"
+"""Header of recording file"""
+FRAME = struct.Struct("<dBI")
+"""Frame header: receive timestamp, frame type and length of frame's data"""
+
+BINARY = 0
+TEXT = 1
+CONNECT = 2
+"""Marks start of a new connection, after which zlib stream starts over"""
+
+
+def recording_path(path: str | Path, name: str, shard: int = 0, total_shards: int = 1) -> Path:
+    """File within `path` directory recording frames of a shard. Shards have their own files,
+    as each connection has it's own zlib stream which can't be interleaved with others
+
+    Example
+    -------
+    >>> recording_path("recordings", "Bot", 1, 4).as_posix()
+    'recordings/Bot-1-4.gw'
+    """
+    return Path(path) / f"{name}-{shard}-{total_shards}.gw"
+
+
+class Recorder:
+    """Appends frames received by a connection to a file
+
+    Parameters
+    ----------
+    path:
+        File to append to. Header is written if it's empty. Missing directories are created
+
+    Example
+    -------
+    >>> import tempfile, os
+    >>> path = os.path.join(tempfile.mkdtemp(), "recording.gw")
+    >>> with Recorder(path) as recorder:
+    ...     recorder.connected()
+    ...     recorder.write('{"op": 11}')
+    >>> [(type, data) for _, type, data in read_frames(path)]
+    [(2, b''), (1, b'{"op": 11}')]
+
+    Shards record to their own files, so their zlib streams replay independently
+
+    >>> import zlib
+    >>> directory = tempfile.mkdtemp()
+    >>> shards = [(Recorder(recording_path(directory, "Bot", shard, 2)), zlib.compressobj()) for shard in range(2)]
+    >>> for recorder, _ in shards:
+    ...     recorder.connected()
+    >>> for sequence in range(1, 4):
+    ...     for recorder, compressor in shards:
+    ...         data = f'{{"op": 0, "s": {sequence}, "t": "TEST_EVENT", "d": {{}}}}'.encode()
+    ...         recorder.write(compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH))
+    >>> for recorder, _ in shards:
+    ...     recorder.close()
+    >>> [
+    ...     asyncio.run(Replayer(recording_path(directory, "Bot", shard, 2), speed=None).replay())["dispatched"]
+    ...     for shard in range(2)
+    ... ]
+    [3, 3]
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._file: BinaryIO = open(path, "ab")
+        if not self._file.tell():
+            self._file.write(MAGIC)
+
+    def _append(self, type: int, data: bytes) -> None:
+        self._file.write(FRAME.pack(time.time(), type, len(data)))
+        self._file.write(data)
+
+    def connected(self) -> None:
+        """Marks start of a new connection"""
+        self._append(CONNECT, b"")
+
+    def write(self, frame: bytes | str) -> None:
+        if isinstance(frame, str):
+            self._append(TEXT, frame.encode("utf-8"))
+        else:
+            self._append(BINARY, frame)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_frames(path: str) -> Iterator[tuple[float, int, bytes]]:
+    """Yields timestamp, type and data of each recorded frame"""
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a Gateway recording")
+        while header := file.read(FRAME.size):
+            if len(header) < FRAME.size:
+                break
+            timestamp, type, length = FRAME.unpack(header)
+            data = file.read(length)
+            if len(data) < length:
+                break
+            yield timestamp, type, data
+
+
+class Replayer:
+    """Feeds recorded frames through `Deserializer` and `Opcodes.dispatch` of a client
+
+    Parameters
+    ----------
+    path:
+        Recording to replay
+    client:
+        Client dispatching events. Defaults to a bare `Opcodes` running registered handlers
+    speed:
+        Multiplier of original pace. `None` replays as fast as possible
+
+    Example
+    -------
+    >>> import tempfile, os
+    >>> path = os.path.join(tempfile.mkdtemp(), "recording.gw")
+    >>> with Recorder(path) as recorder:
+    ...     recorder.connected()
+    ...     recorder.write('{"op": 0, "s": 1, "t": "TEST_EVENT", "d": {}}')
+    ...     recorder.write('{"op": 11}')
+    >>> stats = asyncio.run(Replayer(path, speed=None).replay())
+    >>> stats["frames"], stats["payloads"], stats["dispatched"]
+    (3, 2, 1)
+    """
+
+    def __init__(self, path: str, client: Opcodes = None, speed: float | None = 1.0):
+        self.path = path
+        self.client = client or Opcodes()
+        self.speed = speed
+
+    async def replay(self) -> dict[str, int | float]:
+        """Replays recording returning amount of frames, payloads, dispatched events, bytes and seconds it took"""
+        decompress = Deserializer()
+        stats = {"frames": 0, "payloads": 0, "dispatched": 0, "bytes": 0}
+        first = None
+        start = time.perf_counter()
+
+        for timestamp, type, data in read_frames(self.path):
+            stats["frames"] += 1
+            if self.speed:
+                first = first or timestamp
+                if (delay := (timestamp - first) / self.speed - (time.perf_counter() - start)) > 0:
+                    await asyncio.sleep(delay)
+            if type == CONNECT:
+                decompress = Deserializer()
+                continue
+
+            stats["bytes"] += len(data)
+            payload = decompress(data if type == BINARY else data.decode("utf-8"))
+            if payload is None:
+                continue
+            stats["payloads"] += 1
+            if payload.op is Gateway_Opcodes.DISPATCH:
+                if payload.s is not None:
+                    self.client.last_sequence = payload.s
+                stats["dispatched"] += 1
+                await self.client.dispatch(payload)
+
+        stats["seconds"] = round(time.perf_counter() - start, 4)
+        return stats
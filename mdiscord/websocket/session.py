@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Session Store
+----------
+
+Persists resume state so restarted process can resume it's Gateway session.
+
+:copyright: (c) 2024 Mmesek
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from mdiscord.utils.utils import log
+
+if TYPE_CHECKING:
+    from mdiscord.websocket.opcodes import Opcodes
+
+
+class Session_Store:
+    """Stores `session_id`, `resume_url` and `last_sequence` of each shard in a file within directory
+
+    Parameters
+    ----------
+    path:
+        Directory in which state files are kept
+    name:
+        Name of bot used to tell apart state of different bots
+    max_age:
+        Seconds after which saved session is considered no longer resumable
+
+    Example
+    -------
+    >>> import tempfile
+    >>> from mdiscord.websocket.opcodes import Opcodes
+    >>> store = Session_Store(tempfile.mkdtemp(), "Bot")
+    >>> client = Opcodes()
+    >>> client.shards = [0, 1]
+    >>> client.session_id, client.resume_url, client.last_sequence = "abc", "wss://resume", 42
+    >>> store.save(client)
+    >>> restarted = Opcodes()
+    >>> restarted.shards = [0, 1]
+    >>> store.load(restarted), restarted.session_id, restarted.last_sequence
+    (True, 'abc', 42)
+    >>> store.load(restarted)
+    False
+    """
+
+    def __init__(self, path: str | Path, name: str, max_age: float = 120):
+        self.path = Path(path)
+        self.name = name
+        self.max_age = max_age
+
+    def _file(self, client: "Opcodes") -> Path:
+        return self.path / f"{self.name}-{client.shards[0]}-{client.shards[1]}.json"
+
+    def save(self, client: "Opcodes") -> None:
+        """Writes resume state of client"""
+        if not client.session_id:
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        file = self._file(client)
+        tmp = file.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps(
+                {
+                    "session_id": client.session_id,
+                    "resume_url": client.resume_url,
+                    "last_sequence": client.last_sequence,
+                    "saved_at": time.time(),
+                }
+            )
+        )
+        os.replace(tmp, file)
+        log.debug("Saved session of shard %s at sequence %s", client.shards[0], client.last_sequence)
+
+    def load(self, client: "Opcodes") -> bool:
+        """Restores resume state of client if it's still fresh. Saved state is removed once read"""
+        file = self._file(client)
+        try:
+            state = json.loads(file.read_text())
+            file.unlink()
+        except (OSError, ValueError):
+            return False
+
+        if time.time() - state.get("saved_at", 0) > self.max_age:
+            log.debug("Saved session of shard %s is too old to resume", client.shards[0])
+            return False
+
+        client.session_id = state["session_id"]
+        client.resume_url = state["resume_url"]
+        client.last_sequence = state["last_sequence"]
+        log.info("Restored session of shard %s at sequence %s", client.shards[0], client.last_sequence)
+        return True
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Shard Manager
+----------
+
+Runs multiple shards of a bot within a single process.
+
+:copyright: (c) 2024 Mmesek
+"""
+
+import asyncio
+import signal
+
+from mdiscord.http.client import HTTP_Client
+from mdiscord.utils.utils import log
+from mdiscord.websocket.gateway import Gateway_Cache
+from mdiscord.websocket.metrics import render
+from mdiscord.websocket.ratelimit import Identify_Limiter
+from mdiscord.websocket.websocket import WebSocket_Client, handle_signals
+
+
+class Shard_Manager:
+    """Starts shards of a bot, identifying them in concurrency buckets allowed by `Session_Start_Limit`
+
+    Parameters
+    ----------
+    client:
+        Client class to instantiate for each shard
+    name:
+        Name of bot in config
+    cfg:
+        Config passed to each shard
+    total_shards:
+        Amount of shards. Defaults to `shards` config value or recommended amount from `get_gateway_bot()`
+    shard_ids:
+        Shards to run in this process. Defaults to all of them
+    limiter:
+        Identify limiter shared between shards. Defaults to one created from `session_start_limit`
+    gateway:
+        Gateway cache shared between shards. Defaults to one fetching with manager's own REST client
+    """
+
+    clients: list[WebSocket_Client]
+
+    def __init__(
+        self,
+        client: type[WebSocket_Client],
+        name: str,
+        cfg: dict,
+        total_shards: int = None,
+        shard_ids: list[int] = None,
+        limiter: Identify_Limiter = None,
+        gateway: Gateway_Cache = None,
+    ):
+        self.client = client
+        self.name = name
+        self.cfg = cfg
+        self.total_shards = total_shards or cfg[name].get("shards", None)
+        self.shard_ids = shard_ids
+        self.limiter = limiter
+        self.gateway = gateway
+        self.http: HTTP_Client = None
+        self.clients = []
+        self.stopping = False
+        self.stopped = asyncio.Event()
+
+    async def setup(self) -> None:
+        """Retrieves recommended amount of shards and session start limits then creates clients"""
+        if not self.gateway:
+            self.http = HTTP_Client(
+                token=self.cfg["DiscordTokens"][self.name],
+                api_version=self.cfg.get("Discord", {}).get("api_version", None),
+            )
+            self.gateway = Gateway_Cache(
+                self.http.get_gateway_bot, ttl=self.cfg[self.name].get("gateway_cache_ttl", 300)
+            )
+
+        if not self.total_shards or not self.limiter:
+            gate = await self.gateway.get()
+            self.total_shards = self.total_shards or gate.shards or 1
+            if not self.limiter:
+                self.limiter = Identify_Limiter.from_limit(gate.session_start_limit)
+
+        log.info(
+            "Starting %s shard(s) out of %s with max concurrency of %s",
+            len(self.shard_ids or range(self.total_shards)),
+            self.total_shards,
+            self.limiter.max_concurrency,
+        )
+        for shard in self.shard_ids or range(self.total_shards):
+            client = self.client(self.name, self.cfg, shard=shard, total_shards=self.total_shards)
+            client.identify_limiter = self.limiter
+            client.gateway = self.gateway
+            self.clients.append(client)
+
+    def metrics(self) -> list[dict]:
+        return [
+            {
+                "shard": client.shards[0],
+                "latency": client.latency_percentile(50),
+                "latency_p99": client.latency_percentile(99),
+                "sequence": client.last_sequence,
+                "dispatch": client.executor.metrics(),
+            }
+            for client in self.clients
+        ]
+
+    def prometheus(self) -> str:
+        """Event metrics of shards with `event_metrics` enabled in Prometheus text format"""
+        return render(
+            ({"shard": client.shards[0]}, client.event_metrics) for client in self.clients if client.event_metrics
+        )
+
+    async def shutdown(self) -> None:
+        """Gracefully shuts down all shards. Subsequent calls wait for first one to finish"""
+        if self.stopping:
+            return await self.stopped.wait()
+        self.stopping = True
+        try:
+            await asyncio.gather(*(client.shutdown() for client in self.clients))
+            if self.http:
+                await self.http.close()
+        finally:
+            self.stopped.set()
+
+    def handle_signals(self, *signals: signal.Signals) -> None:
+        """Shuts down gracefully on signals (Unix only)"""
+        handle_signals(self.shutdown, *signals)
+
+    async def start(self) -> None:
+        await self.setup()
+        self.handle_signals()
+        # Shards share the loop, so it's enough to monitor it once
+        monitor = self.clients[0].monitor if self.clients else None
+        if monitor:
+            monitor.start()
+        try:
+            await asyncio.gather(*(client.start() for client in self.clients))
+            if self.stopping:
+                await self.stopped.wait()
+        finally:
+            if monitor:
+                monitor.stop()
+
+    @classmethod
+    def run(cls, *args, **kwargs):
+        asyncio.run(cls(*args, **kwargs).start())
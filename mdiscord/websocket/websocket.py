@@ -9,23 +9,70 @@ Websocket Client for Discord API.
 """
 
 import asyncio
+import signal
 import time
+from typing import Callable, Coroutine
 
+import aiohttp
+import msgspec
 from mlib.types import Invalid
 
 from mdiscord import types as objects
+from mdiscord.exceptions import FatalCloseCode
 from mdiscord.http.client import HTTP_Client
 from mdiscord.utils.serializer import Deserializer, as_dict
-from mdiscord.utils.utils import log
-from mdiscord.websocket.opcodes import Gateway_Opcodes, Opcodes
+from mdiscord.utils.utils import count, log
+from mdiscord.websocket.executor import Dispatch_Executor
+from mdiscord.websocket.gateway import Gateway_Cache
+from mdiscord.websocket.ingest import Ingest_Thread
+from mdiscord.websocket.metrics import Event_Metrics
+from mdiscord.websocket.monitor import Loop_Monitor
+from mdiscord.websocket.opcodes import RESUMABLE_CLOSE_CODE, Gateway_Opcodes, Opcodes
+from mdiscord.websocket.ratelimit import Send_Limiter
+from mdiscord.websocket.reconnect import Reconnect_Action, Reconnect_Policy
+from mdiscord.websocket.replay import Recorder, recording_path
+from mdiscord.websocket.session import Session_Store
+
+_SHUTDOWNS: set[asyncio.Task] = set()
+"""Shutdowns started by signals, referenced until they finish"""
+
+
+def handle_signals(shutdown: Callable[[], Coroutine], *signals: signal.Signals) -> None:
+    """Runs `shutdown` on signals (Unix only), keeping reference to it's task so it isn't collected mid-flight"""
+
+    def on_signal():
+        task = asyncio.ensure_future(shutdown())
+        _SHUTDOWNS.add(task)
+        task.add_done_callback(_SHUTDOWNS.discard)
+
+    loop = asyncio.get_running_loop()
+    for sig in signals or (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, on_signal)
+        except (NotImplementedError, RuntimeError):
+            log.debug("Signal handlers are not supported on this platform")
+            return
 
 
 class WebSocket_Client(HTTP_Client, Opcodes):
     username: str = "[NOT CONNECTED]"
     latency: float = 0.0
     presence: objects.Gateway_Presence_Update = None
-    intents: int = 0
+    intents: int | str = 0
     decompress: Deserializer = None
+    executor: Dispatch_Executor = None
+    send_limiter: Send_Limiter = None
+    reconnect_policy: Reconnect_Policy = None
+    session_store: Session_Store = None
+    gateway: Gateway_Cache = None
+    stopping: bool = False
+    stopped: asyncio.Event = None
+    shutdown_timeout: float = 30
+    ingest_thread: bool = False
+    ingest_queue_size: int = 1000
+    skip_bots: bool = False
+    recorder: Recorder = None
+    monitor: Loop_Monitor = None
 
     def __init__(self, name: str, cfg: dict, shard: int = 0, total_shards: int = 1):
         self.username = "[NOT CONNTECTED] " + name
@@ -45,7 +92,39 @@ class WebSocket_Client(HTTP_Client, Opcodes):
         )
 
         self.intents = cfg[name].get("intents", 0)
+        extra_intents = cfg[name].get("extra_intents", 0)
+        self.extra_intents = count(*extra_intents) if isinstance(extra_intents, list) else extra_intents
         self.shards = [shard, total_shards]
+        if cfg[name].get("event_metrics", False):
+            self.event_metrics = Event_Metrics(slow_handler=cfg[name].get("slow_handler", 1))
+        self.executor = Dispatch_Executor(
+            self.dispatch,
+            workers=cfg[name].get("dispatch_workers", 0),
+            queue_size=cfg[name].get("dispatch_queue_size", 10000),
+            overflow=cfg[name].get("dispatch_overflow", "block"),
+            spill_size=cfg[name].get("dispatch_spill_size", 100000),
+            ordered=cfg[name].get("dispatch_ordered", False),
+            event_metrics=self.event_metrics,
+            shed_watermark=cfg[name].get("shed_watermark", None),
+            shed_priority=cfg[name].get("shed_priority", 3),
+            shed_sample=cfg[name].get("shed_sample", 0),
+        )
+        self.send_limiter = Send_Limiter()
+        self.reconnect_policy = Reconnect_Policy(
+            base=cfg[name].get("reconnect_base", 1), cap=cfg[name].get("reconnect_cap", 60)
+        )
+        self.ingest_thread = cfg[name].get("ingest_thread", False)
+        self.ingest_queue_size = cfg[name].get("ingest_queue_size", 1000)
+        self.skip_bots = cfg[name].get("skip_bots", False)
+        self.shutdown_timeout = cfg[name].get("shutdown_timeout", 30)
+        self.stopped = asyncio.Event()
+        self.gateway = Gateway_Cache(self.get_gateway_bot, ttl=cfg[name].get("gateway_cache_ttl", 300))
+        if path := cfg[name].get("session_store", None):
+            self.session_store = Session_Store(path, name, cfg[name].get("session_max_age", 120))
+        if path := cfg[name].get("record", None):
+            self.recorder = Recorder(recording_path(path, name, shard, total_shards))
+        if cfg[name].get("loop_monitor", False):
+            self.monitor = Loop_Monitor(threshold=cfg[name].get("loop_lag_threshold", 0.5))
 
         super().__init__(
             token=cfg["DiscordTokens"][name],
@@ -59,33 +138,84 @@ class WebSocket_Client(HTTP_Client, Opcodes):
         pass
 
     async def __aenter__(self):
-        self.decompress = Deserializer()
+        self.decompress = Deserializer(self.unhandled if self.skip_bots else None)
         if self._session and self._session.closed or not self._session:
             log.debug("Restarting session")
             self._new_session()
         if not self.resume_url:
-            gate = await self.get_gateway_bot()
-            url = gate.url
+            url = (await self.gateway.get()).url
         else:
             url = self.resume_url
         self._ws = await self._session.ws_connect(
             f"{url}?" + (f"v={self.api_version}&" if self.api_version else "") + "encoding=json&compress=zlib-stream"
         )
+        if self.recorder:
+            self.recorder.connected()
         return self
 
     async def receive(self):
+        if self.ingest_thread:
+            return await self._receive_threaded()
         async for msg in self._ws:
+            if self.recorder and msg.type in {aiohttp.WSMsgType.BINARY, aiohttp.WSMsgType.TEXT}:
+                self.recorder.write(msg.data)
             try:
+                started = time.perf_counter()
                 data = self.decompress(msg.data)
+                if self.event_metrics and msg.type in {aiohttp.WSMsgType.BINARY, aiohttp.WSMsgType.TEXT}:
+                    self.event_metrics.received(len(msg.data), time.perf_counter() - started, data)
                 if data is not None:
-                    if data.op != Gateway_Opcodes.HEARTBEAT_ACK and data.s is not None:
-                        self.last_sequence = data.s
-                    asyncio.create_task(self.opcodes.get(data.op.value, Invalid)(data), name="Dispatch")
+                    await self.handle(data)
             except Exception as ex:
                 log.exception("Exception! Type: %s", msg.type, exc_info=ex)
 
-    async def send(self, _json: object):
+    async def _receive_threaded(self):
+        """Reads frames on the loop while inflating and decoding them in `Ingest_Thread`"""
+        ingest = Ingest_Thread(asyncio.get_running_loop(), self.decompress, self.event_metrics, self.ingest_queue_size)
+        ingest.start()
+
+        async def read():
+            try:
+                async for msg in self._ws:
+                    if msg.type in {aiohttp.WSMsgType.BINARY, aiohttp.WSMsgType.TEXT}:
+                        if self.recorder:
+                            self.recorder.write(msg.data)
+                        await ingest.feed(msg.data)
+            finally:
+                ingest.close()
+
+        reader = asyncio.create_task(read(), name="Gateway Reader")
+        try:
+            async for data in ingest:
+                if isinstance(data, Exception):
+                    log.exception("Exception while decoding frame", exc_info=data)
+                    continue
+                try:
+                    await self.handle(data)
+                except Exception as ex:
+                    log.exception("Exception! Opcode: %s", data.op, exc_info=ex)
+        finally:
+            reader.cancel()
+            ingest.close()
+
+    async def handle(self, data: objects.Gateway_Payload):
+        """Routes decoded payload to it's opcode handler"""
+        if self.stopping:
+            return  # Not handled, so sequence isn't advanced and it's replayed after resuming
+        if data.op != Gateway_Opcodes.HEARTBEAT_ACK and data.s is not None:
+            self.last_sequence = data.s
+        if data.op is Gateway_Opcodes.DISPATCH:
+            if data.d is msgspec.UNSET:
+                return  # Message from bot nothing handles, skipped by Deserializer
+            if data.t in {"READY", "RESUMED"} and self.reconnect_policy.attempt:
+                log.info("Reconnected after %ss", self.reconnect_policy.connected())
+            await self.executor.submit(data)
+        else:
+            self.executor.spawn(self.opcodes.get(data.op.value, Invalid)(data), name=data.op.name.title())
+
+    async def send(self, _json: object, heartbeat: bool = False):
         _json = as_dict(_json)
+        await self.send_limiter.acquire(heartbeat)
         try:  #
             return await self._ws.send_json(_json)  ##
         except Exception as ex:  #
@@ -99,18 +229,96 @@ class WebSocket_Client(HTTP_Client, Opcodes):
         await self._ws.close()
         await self._session.close()
 
+    async def shutdown(self):
+        """Closes connection keeping session resumable, waits for received payloads to be handled
+        and saves session's state to `session_store` if configured. Subsequent calls wait for first one to finish"""
+        if self.stopping:
+            return await self.stopped.wait()
+        self.stopping = True
+        self.keepConnection = False
+        try:
+            await self._shutdown()
+        finally:
+            self.stopped.set()
+
+    async def _shutdown(self):
+        if hasattr(self, "heartbeating"):
+            self.heartbeating.cancel()
+        if getattr(self, "_ws", None) is not None:
+            await self._ws.close(code=RESUMABLE_CLOSE_CODE)
+        if not await self.executor.drain(self.shutdown_timeout):
+            if (sequence := self.executor.first_unhandled()) is not None:
+                self.last_sequence = sequence - 1  # Resume from first payload that wasn't handled
+        self.executor.stop()
+        await asyncio.gather(*(collector.drain() for collector in self.batch_collectors.values()))
+        if self.session_store:
+            self.session_store.save(self)
+        if self.recorder:
+            self.recorder.close()
+        if self.event_metrics and self.intents != "auto" and (report := self.unused_intents())["unused"]:
+            log.info(
+                "Events of unused intents %s took %s of %s received bytes",
+                ", ".join(report["unused"]),
+                report["unused_bytes"],
+                report["received_bytes"],
+            )
+
+    def handle_signals(self, *signals: signal.Signals):
+        """Shuts down gracefully on signals (Unix only)"""
+        handle_signals(self.shutdown, *signals)
+
+    async def start(self):
+        """Initializes client and keeps it connected"""
+        await self.init()
+        if self.intents != "auto" and (report := self.unused_intents())["unused"]:
+            log.info(
+                "Intents %s are not required by any handler. Set intents to `auto` to identify with %s instead of %s",
+                ", ".join(report["unused"]),
+                report["required"],
+                report["configured"],
+            )
+        if self.session_store:
+            self.session_store.load(self)
+        while not self.stopping:
+            code = None
+            try:
+                async with self:
+                    try:
+                        await self.receive()
+                    except KeyboardInterrupt:
+                        return
+                    except Exception as ex:
+                        log.critical("Uncaught Exception", exc_info=ex)
+                    code = self._ws.close_code
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as ex:
+                log.warning("Connection failed: %s", ex)
+
+            if self.stopping:
+                break
+
+            action = self.reconnect_policy.disconnected(code)
+            if action is Reconnect_Action.FATAL:
+                raise FatalCloseCode(code, objects.Gateway_Close_Event_Codes(code).name)
+            elif action is Reconnect_Action.IDENTIFY:
+                self.session_id = self.resume_url = self.last_sequence = None
+
+            delay = self.reconnect_policy.delay()
+            log.info("Connection closed with code %s, %s in %ss", code, action.name.lower(), round(delay, 2))
+            await asyncio.sleep(delay)
+        # Shutdown runs in it's own task, which would be cancelled if we returned before it finished
+        await self.stopped.wait()
+
     @classmethod
     async def runner(cls, **kwargs):
         ws = cls(**kwargs)
-        await ws.init()
-        while True:
-            async with ws:
-                try:
-                    await ws.receive()
-                except KeyboardInterrupt:
-                    return
-                except Exception as ex:
-                    log.critical("Uncaught Exception", exc_info=ex)
+        ws.handle_signals()
+        if ws.monitor:
+            ws.monitor.start()
+        try:
+            await ws.start()
+        finally:
+            if ws.monitor:
+                ws.monitor.stop()
 
     @classmethod
     def run(cls, **kwargs):